@@ -6,10 +6,93 @@ Usage: python generate_chart.py --data-file <path> --type <type> --output <path>
 
 import json
 import argparse
+import base64
+import contextlib
+import gzip
+import html
+import importlib
 import os
 import sys
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, TextIO
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Heavier optional dependencies (altair, pyarrow, vl_convert, lzstring) are
+# imported on first use by _optional_import, so --format json runs never
+# pay for them
+_OPTIONAL_MODULES: Dict[str, Any] = {}
+
+# Column-name substrings that mark a column as temporal
+TEMPORAL_KEYWORDS = frozenset(('date', 'time', 'day', 'month', 'year', 'timestamp'))
+LINE_TEMPORAL_KEYWORDS = ('date', 'time', 'day', 'month')
+AREA_TEMPORAL_KEYWORDS = ('date', 'time')
+
+# HTML page that decompresses an lz-string payload and embeds the spec
+LZ_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>{title}</title>
+  <script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+  <script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+  <script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>
+  <script src="https://cdn.jsdelivr.net/npm/lz-string@1.5.0/libs/lz-string.min.js"></script>{loader}
+</head>
+<body>
+  <div id="vis"></div>
+  <script>
+    vegaEmbed('#vis', JSON.parse(LZString.decompressFromBase64("{payload}")));
+  </script>
+</body>
+</html>
+"""
+
+# Write buffer for spec and data files, so large specs go out in big chunks
+WRITE_BUFFER_SIZE = 1 << 17
+
+# Registers Vega's Arrow format reader, for pages whose spec carries Arrow data
+ARROW_LOADER_HTML = """
+  <script src="https://cdn.jsdelivr.net/npm/vega-loader-arrow@0.1"></script>
+  <script>vega.formats('arrow', vegaLoaderArrow);</script>"""
+
+# Printed wherever an Arrow-data spec leaves this script without a page that
+# registers the loader
+ARROW_RENDER_HINT = "  Its data is Arrow: render it with vega-loader-arrow registered " \
+                    "(vega.formats('arrow', vegaLoaderArrow))"
+
+# Row count above which --data auto writes the data to a separate file (or,
+# when streaming to stdout, embeds it as base64 Arrow IPC)
+EXTERNAL_DATA_THRESHOLD = 5000
+
+
+def _optional_import(name: str) -> Any:
+    """Import an optional dependency once, returning None if it is missing."""
+    try:
+        return _OPTIONAL_MODULES[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _OPTIONAL_MODULES[name] = module
+    return module
+
+
+def load_json(path: str) -> Any:
+    """Load a JSON file ('-' for stdin), using orjson when available."""
+    if path == '-':
+        raw = sys.stdin.buffer.read()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
 
 
 def detect_chart_type(data: List[Dict]) -> str:
@@ -17,16 +100,14 @@ def detect_chart_type(data: List[Dict]) -> str:
     if not data:
         return 'bar'
     
-    columns = list(data[0].keys())
-    
-    # Check for temporal columns
-    temporal_keywords = ['date', 'time', 'day', 'month', 'year', 'timestamp']
-    has_temporal = any(any(kw in col.lower() for kw in temporal_keywords) for col in columns)
-    
-    # Check for numeric columns
+    # Check for temporal and numeric columns in a single pass
+    row0 = data[0]
+    has_temporal = False
     numeric_cols = 0
-    for col in columns:
-        val = data[0].get(col)
+    for col, val in row0.items():
+        if not has_temporal:
+            lc = col.lower()
+            has_temporal = any(kw in lc for kw in TEMPORAL_KEYWORDS)
         if isinstance(val, (int, float)):
             numeric_cols += 1
     
@@ -57,68 +138,63 @@ def build_vega_spec(data: List[Dict], chart_type: str, title: str, width: int, h
     }
     
     if chart_type == 'bar':
-        spec = {
-            **base_spec,
-            "mark": {"type": "bar", "cornerRadiusEnd": 4},
-            "encoding": {
-                "x": {
-                    "field": columns[0],
-                    "type": "ordinal",
-                    "sort": "-y",
-                    "axis": {"labelAngle": -45}
-                },
-                "y": {
-                    "field": columns[1],
-                    "type": "quantitative"
-                },
-                "tooltip": [
-                    {"field": columns[0], "type": "ordinal"},
-                    {"field": columns[1], "type": "quantitative"}
-                ]
-            }
+        spec = base_spec.copy()
+        spec["mark"] = {"type": "bar", "cornerRadiusEnd": 4}
+        spec["encoding"] = {
+            "x": {
+                "field": columns[0],
+                "type": "ordinal",
+                "sort": "-y",
+                "axis": {"labelAngle": -45}
+            },
+            "y": {
+                "field": columns[1],
+                "type": "quantitative"
+            },
+            "tooltip": [
+                {"field": columns[0], "type": "ordinal"},
+                {"field": columns[1], "type": "quantitative"}
+            ]
         }
     
     elif chart_type == 'line':
         # Detect if x-axis should be temporal
-        x_type = "temporal" if any(kw in columns[0].lower() for kw in ['date', 'time', 'day', 'month']) else "ordinal"
+        x_lower = columns[0].lower()
+        x_type = "temporal" if any(kw in x_lower for kw in LINE_TEMPORAL_KEYWORDS) else "ordinal"
         
-        spec = {
-            **base_spec,
-            "mark": {"type": "line", "point": True, "interpolate": "monotone"},
-            "encoding": {
-                "x": {
-                    "field": columns[0],
-                    "type": x_type
-                },
-                "y": {
-                    "field": columns[1],
-                    "type": "quantitative"
-                },
-                "tooltip": [
-                    {"field": columns[0], "type": x_type},
-                    {"field": columns[1], "type": "quantitative"}
-                ]
-            }
+        spec = base_spec.copy()
+        spec["mark"] = {"type": "line", "point": True, "interpolate": "monotone"}
+        spec["encoding"] = {
+            "x": {
+                "field": columns[0],
+                "type": x_type
+            },
+            "y": {
+                "field": columns[1],
+                "type": "quantitative"
+            },
+            "tooltip": [
+                {"field": columns[0], "type": x_type},
+                {"field": columns[1], "type": "quantitative"}
+            ]
         }
     
     elif chart_type == 'pie':
-        spec = {
-            **base_spec,
-            "mark": {"type": "arc", "innerRadius": 50},
-            "encoding": {
-                "theta": {
-                    "field": columns[1],
-                    "type": "quantitative"
-                },
-                "color": {
-                    "field": columns[0],
-                    "type": "nominal"
-                },
-                "tooltip": [
-                    {"field": columns[0], "type": "nominal"},
-                    {"field": columns[1], "type": "quantitative"}
-                ]
-            }
+        spec = base_spec.copy()
+        spec["mark"] = {"type": "arc", "innerRadius": 50}
+        spec["encoding"] = {
+            "theta": {
+                "field": columns[1],
+                "type": "quantitative"
+            },
+            "color": {
+                "field": columns[0],
+                "type": "nominal"
+            },
+            "tooltip": [
+                {"field": columns[0], "type": "nominal"},
+                {"field": columns[1], "type": "quantitative"}
+            ]
         }
     
     elif chart_type == 'scatter':
@@ -130,40 +206,37 @@ def build_vega_spec(data: List[Dict], chart_type: str, title: str, width: int, h
         else:
             x_field, y_field = columns[0], columns[1]
         
-        spec = {
-            **base_spec,
-            "mark": "point",
-            "encoding": {
-                "x": {
-                    "field": x_field,
-                    "type": "quantitative"
-                },
-                "y": {
-                    "field": y_field,
-                    "type": "quantitative"
-                },
-                "tooltip": [
-                    {"field": x_field, "type": "quantitative"},
-                    {"field": y_field, "type": "quantitative"}
-                ]
-            }
+        spec = base_spec.copy()
+        spec["mark"] = "point"
+        spec["encoding"] = {
+            "x": {
+                "field": x_field,
+                "type": "quantitative"
+            },
+            "y": {
+                "field": y_field,
+                "type": "quantitative"
+            },
+            "tooltip": [
+                {"field": x_field, "type": "quantitative"},
+                {"field": y_field, "type": "quantitative"}
+            ]
         }
     
     elif chart_type == 'area':
-        x_type = "temporal" if any(kw in columns[0].lower() for kw in ['date', 'time']) else "ordinal"
+        x_lower = columns[0].lower()
+        x_type = "temporal" if any(kw in x_lower for kw in AREA_TEMPORAL_KEYWORDS) else "ordinal"
         
-        spec = {
-            **base_spec,
-            "mark": "area",
-            "encoding": {
-                "x": {
-                    "field": columns[0],
-                    "type": x_type
-                },
-                "y": {
-                    "field": columns[1],
-                    "type": "quantitative"
-                }
+        spec = base_spec.copy()
+        spec["mark"] = "area"
+        spec["encoding"] = {
+            "x": {
+                "field": columns[0],
+                "type": x_type
+            },
+            "y": {
+                "field": columns[1],
+                "type": "quantitative"
             }
         }
     else:
@@ -172,88 +245,190 @@ def build_vega_spec(data: List[Dict], chart_type: str, title: str, width: int, h
     return spec
 
 
-def render_with_altair(spec: Dict, output_path: str, format: str = 'png'):
-    """Render Vega-Lite spec using Altair."""
+def render_with_vl_convert(spec: Dict, output_path: str, format: str = 'png') -> bool:
+    """Render Vega-Lite spec in-process with vl-convert."""
+    vl_convert = _optional_import('vl_convert')
+    if vl_convert is None:
+        print("⚠ vl-convert not installed. Install with: pip install vl-convert-python")
+        return False
+    
     try:
-        import altair as alt
-        import pandas as pd
-        
-        # Convert data to DataFrame
-        df = pd.DataFrame(spec['data']['values'])
-        
-        # Build chart based on spec
-        mark = spec['mark']
-        encoding = spec['encoding']
-        
-        if isinstance(mark, dict):
-            mark_type = mark['type']
+        if format == 'svg':
+            with open(output_path, 'w') as f:
+                f.write(vl_convert.vegalite_to_svg(spec))
         else:
-            mark_type = mark
-        
-        # Create base chart
-        chart = alt.Chart(df)
-        
-        # Apply mark
-        if mark_type == 'bar':
-            chart = chart.mark_bar(cornerRadiusEnd=4)
-        elif mark_type == 'line':
-            chart = chart.mark_line(point=True)
-        elif mark_type == 'arc':
-            chart = chart.mark_arc(innerRadius=50)
-        elif mark_type == 'point':
-            chart = chart.mark_point()
-        elif mark_type == 'area':
-            chart = chart.mark_area()
-        
-        # Apply encoding
-        encodings = {}
-        for key, val in encoding.items():
-            if key == 'tooltip':
-                encodings[key] = val
-            else:
-                encodings[key] = alt.X(val['field'], type=val['type']) if key == 'x' else \
-                                 alt.Y(val['field'], type=val['type']) if key == 'y' else \
-                                 alt.Theta(val['field'], type=val['type']) if key == 'theta' else \
-                                 alt.Color(val['field'], type=val['type'])
-        
-        chart = chart.encode(**encodings)
-        
-        # Set title
-        if 'title' in spec:
-            chart = chart.properties(title=spec['title'])
-        
-        # Save
-        if format == 'png':
-            chart.save(output_path)
-        else:
-            chart.save(output_path)
-        
+            with open(output_path, 'wb') as f:
+                f.write(vl_convert.vegalite_to_png(spec, scale=2.0))
         return True
+    except Exception as e:
+        print(f"✗ Error rendering with vl-convert: {e}")
+        return False
+
+
+def render_chart(spec: Dict, output_path: str, format: str = 'png', backend: str = 'auto') -> bool:
+    """Render a chart with the chosen backend.
     
-    except ImportError:
-        print("⚠ Altair not installed. Install with: pip install altair pandas")
+    'auto' uses vl-convert when it is installed and Altair otherwise.
+    """
+    if backend == 'vl-convert' or (backend == 'auto' and _optional_import('vl_convert') is not None):
+        return render_with_vl_convert(spec, output_path, format)
+    return render_with_altair(spec, output_path, format)
+
+
+def render_with_altair(spec: Dict, output_path: str, format: str = 'png'):
+    """Render Vega-Lite spec using Altair.
+    
+    The spec is handed to Altair as-is; the output format follows the
+    extension of output_path.
+    """
+    alt = _optional_import('altair')
+    if alt is None:
+        print("⚠ Altair not installed. Install with: pip install altair")
         return False
+    
+    try:
+        alt.Chart.from_dict(spec).save(output_path)
+        return True
+    
     except Exception as e:
         print(f"✗ Error rendering with Altair: {e}")
         return False
 
 
-def save_vega_spec(spec: Dict, output_path: str):
-    """Save Vega-Lite spec as JSON for manual rendering."""
-    with open(output_path, 'w') as f:
-        json.dump(spec, f, indent=2)
+def _dumps_json(obj: Any, indent: bool = False) -> bytes:
+    """Serialize an object to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+
+def _write_json(obj: Any, path: str, indent: bool = False):
+    """Write an object as JSON through a large buffer, using orjson when available.
+    
+    Without orjson, json.dump streams the encoder's chunks into the buffer
+    instead of building the whole document in memory.
+    """
+    if orjson is not None:
+        with open(path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0))
+    else:
+        with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            json.dump(obj, f, indent=2 if indent else None)
+
+
+def externalize_data(spec: Dict, output_path: str) -> Dict:
+    """Write the spec's inline data next to output_path and reference it by URL.
+    
+    Returns a copy of the spec whose data points at the sibling file, so large
+    result sets are not embedded in the spec itself.
+    """
+    values = spec.get('data', {}).get('values')
+    if values is None:
+        return spec
+    
+    data_path = os.path.splitext(output_path)[0] + '.data.json'
+    _write_json(values, data_path)
+    print(f"✓ Data saved: {data_path}")
+    
+    spec = dict(spec)
+    spec['data'] = {"url": os.path.basename(data_path), "format": {"type": "json"}}
+    return spec
+
+
+def _encode_arrow_b64(rows: List[Dict]) -> str:
+    """Encode rows as a base64 Arrow IPC stream."""
+    pa = _optional_import('pyarrow')
+    ipc = _optional_import('pyarrow.ipc')
+    table = pa.Table.from_pylist(rows)
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue()).decode('ascii')
+
+
+def encode_arrow_data(spec: Dict) -> Dict:
+    """Return a copy of the spec with its inline data as an Arrow data URL.
+    
+    Falls back to the unchanged spec when pyarrow is not installed.
+    """
+    values = spec.get('data', {}).get('values')
+    if values is None:
+        return spec
+    if _optional_import('pyarrow') is None:
+        print("⚠ pyarrow not installed, keeping inline JSON data. Install with: pip install pyarrow")
+        return spec
+    
+    spec = dict(spec)
+    spec['data'] = {
+        "url": f"data:application/vnd.apache.arrow.stream;base64,{_encode_arrow_b64(values)}",
+        "format": {"type": "arrow"}
+    }
+    return spec
+
+
+def _has_arrow_data(spec: Dict) -> bool:
+    """Whether the spec's data needs Vega's Arrow format reader."""
+    return spec.get('data', {}).get('format', {}).get('type') == 'arrow'
+
+
+def resolve_data_mode(mode: str, row_count: int, stream: bool = False) -> str:
+    """Resolve the --data choice to 'inline', 'external' or 'arrow'.
+    
+    auto never picks Arrow for a file, only for a stream, which has no
+    sibling path to externalize large data to.
+    """
+    if mode != 'auto':
+        return mode
+    if row_count <= EXTERNAL_DATA_THRESHOLD:
+        return 'inline'
+    return 'arrow' if stream else 'external'
+
+
+def save_vega_spec(spec: Dict, output_path: str, data_mode: str = 'inline',
+                   compress: str = 'none', pretty: bool = False) -> str:
+    """Save Vega-Lite spec as JSON for manual rendering.
+    
+    The spec is written compactly unless pretty is set. With compress='gzip'
+    it is written to output_path + '.gz'; with compress='lz' it is written as
+    an HTML page embedding an lz-string payload. Returns the path actually
+    written.
+    """
+    if data_mode == 'external':
+        spec = externalize_data(spec, output_path)
+    elif data_mode == 'arrow':
+        spec = encode_arrow_data(spec)
+    
+    lzstring = _optional_import('lzstring') if compress == 'lz' else None
+    if compress == 'lz' and lzstring is None:
+        print("⚠ lzstring not installed, saving uncompressed. Install with: pip install lzstring")
+        compress = 'none'
+    
+    if compress == 'gzip':
+        output_path = output_path + '.gz'
+        with gzip.open(output_path, 'wb') as f:
+            f.write(_dumps_json(spec))
+    elif compress == 'lz':
+        payload = lzstring.LZString().compressToBase64(_dumps_json(spec).decode('utf-8'))
+        output_path = os.path.splitext(output_path)[0] + '.html'
+        with open(output_path, 'w') as f:
+            loader = ARROW_LOADER_HTML if _has_arrow_data(spec) else ''
+            f.write(LZ_HTML_TEMPLATE.format(title=html.escape(str(spec.get('title', 'Chart'))),
+                                            loader=loader, payload=payload))
+    else:
+        _write_json(spec, output_path, indent=pretty)
     print(f"✓ Vega spec saved: {output_path}")
+    return output_path
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description='Generate charts from data')
     parser.add_argument('--data-file', required=True,
-                       help='Path to JSON file with query results')
+                       help='Path to JSON file with query results (- for stdin)')
     parser.add_argument('--type', choices=['bar', 'line', 'pie', 'scatter', 'area', 'auto'],
                        default='auto',
                        help='Chart type (auto-detect if not specified)')
     parser.add_argument('--output', required=True,
-                       help='Output file path')
+                       help='Output file path (- to write the JSON spec to stdout)')
     parser.add_argument('--format', choices=['png', 'svg', 'json'],
                        default='png',
                        help='Output format')
@@ -263,13 +438,44 @@ def main():
                        help='Chart width')
     parser.add_argument('--height', type=int, default=400,
                        help='Chart height')
+    parser.add_argument('--data', choices=['auto', 'inline', 'external', 'arrow'],
+                       default='auto',
+                       help='How the saved spec carries its data: inline JSON, a sibling file, '
+                            f'or base64 Arrow (auto: external above {EXTERNAL_DATA_THRESHOLD} rows, '
+                            'or Arrow when writing to stdout)')
+    parser.add_argument('--compress', choices=['none', 'gzip', 'lz'],
+                       default='none',
+                       help='Compress the saved spec (gzip: .json.gz, lz: self-decoding HTML page)')
+    parser.add_argument('--backend', choices=['auto', 'vl-convert', 'altair'],
+                       default='auto',
+                       help='Image renderer (auto: vl-convert if installed, else Altair)')
+    parser.add_argument('--pretty', action='store_true',
+                       help='Indent the saved JSON spec for reading')
+    
+    args = parser.parse_args(argv)
     
-    args = parser.parse_args()
+    if args.output != '-':
+        return generate(args)
     
+    # Stream the spec to stdout and move status messages to stderr
+    if args.format != 'json' or args.compress != 'none' or args.data == 'external':
+        print("✗ --output - requires --format json without --compress or --data external",
+              file=sys.stderr)
+        return 1
+    stream = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return generate(args, stream)
+
+
+def generate(args: argparse.Namespace, stream: Optional[TextIO] = None) -> int:
+    """Generate a chart from parsed CLI arguments.
+    
+    With a stream, the spec is written there as JSON instead of to
+    args.output. Returns the process exit code.
+    """
     # Load data
     try:
-        with open(args.data_file, 'r') as f:
-            data = json.load(f)
+        data = load_json(args.data_file)
     except FileNotFoundError:
         print(f"✗ Data file not found: {args.data_file}")
         return 1
@@ -289,7 +495,7 @@ def main():
     title = args.title
     if not title:
         # Generate from output filename
-        basename = os.path.basename(args.output)
+        basename = os.path.basename(args.output) if stream is None else 'chart'
         title = basename.replace('-', ' ').replace('_', ' ').title()
         # Remove extension
         title = os.path.splitext(title)[0]
@@ -301,23 +507,36 @@ def main():
         print("✗ Could not build chart specification")
         return 1
     
+    data_mode = resolve_data_mode(args.data, len(data), stream is not None)
+    
+    if stream is not None:
+        if data_mode == 'arrow':
+            spec = encode_arrow_data(spec)
+            if _has_arrow_data(spec):
+                print(ARROW_RENDER_HINT)
+        stream.write(_dumps_json(spec, indent=args.pretty).decode('utf-8') + '\n')
+        return 0
+    
     # Ensure output directory exists
     os.makedirs(os.path.dirname(args.output) if os.path.dirname(args.output) else '.', exist_ok=True)
     
     # Render or save
     if args.format == 'json':
         # Just save the spec
-        save_vega_spec(spec, args.output)
+        save_vega_spec(spec, args.output, data_mode, args.compress, args.pretty)
     else:
         # Try to render
-        if render_with_altair(spec, args.output, args.format):
+        if render_chart(spec, args.output, args.format, args.backend):
             print(f"✓ Chart generated: {args.output}")
         else:
             # Fallback to saving spec
             spec_path = args.output.replace(f'.{args.format}', '.json')
-            save_vega_spec(spec, spec_path)
+            spec_path = save_vega_spec(spec, spec_path, data_mode, args.compress, args.pretty)
             print(f"⚠ Could not render image. Vega spec saved for manual rendering.")
-            print(f"  View online: https://vega.github.io/editor/#/url={spec_path}")
+            if data_mode == 'arrow' and _optional_import('pyarrow') is not None:
+                print(ARROW_RENDER_HINT)
+            else:
+                print(f"  View online: https://vega.github.io/editor/#/url={spec_path}")
     
     return 0
 
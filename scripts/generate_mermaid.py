@@ -6,49 +6,105 @@ Usage: python generate_mermaid.py <type> --schema-file <path> --output <path> [-
 
 import json
 import argparse
+import base64
 import webbrowser
-import urllib.parse
 import os
+import sys
+import threading
+import zlib
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Name of the background thread that opens mermaid.live
+BROWSER_THREAD_NAME = 'mermaid-live-opener'
+
+# Characters that would end or break a Mermaid node label
+_MERMAID_ESCAPE = str.maketrans({
+    '[': '&#91;',
+    ']': '&#93;',
+    '"': '&quot;',
+    '|': '&#124;',
+    '\n': '<br/>',
+})
+
+
+def load_json(path):
+    """Load a JSON file ('-' for stdin), using orjson when available."""
+    if path == '-':
+        raw = sys.stdin.buffer.read()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _build_fk_index(schema):
+    """Index a schema's foreign keys in one pass.
+    
+    Returns (tables_dict, upper_names, edges, reverse_edges): the schema's
+    tables, the display name of every table and referenced table, each
+    table's referenced tables in FK order, and each referenced table's
+    referencing tables. Display names are interned, so every edge and entity
+    line that mentions a table shares one string object.
+    """
+    tables_dict = schema.get('tables', {})
+    upper_names = {}
+    edges = {}
+    reverse_edges = {}
+    
+    for table, table_info in tables_dict.items():
+        upper_names[table] = sys.intern(table.upper())
+        refs = []
+        for fk in table_info.get('foreign_keys', []):
+            ref_table = fk.get('references_table')
+            if not ref_table:
+                continue
+            refs.append(ref_table)
+            reverse_edges.setdefault(ref_table, []).append(table)
+            if ref_table not in upper_names:
+                upper_names[ref_table] = sys.intern(ref_table.upper())
+        edges[table] = refs
+    
+    return tables_dict, upper_names, edges, reverse_edges
+
 
 def generate_erd(schema, tables=None):
     """Generate Entity Relationship Diagram from schema."""
+    tables_dict, upper_names, edges, _ = _build_fk_index(schema)
     
     if tables:
         # Include specified tables and their related tables
-        relevant = set(tables)
+        tables_to_render = set(tables)
         for table in tables:
-            if table in schema.get('tables', {}):
-                for fk in schema['tables'][table].get('foreign_keys', []):
-                    relevant.add(fk.get('references_table'))
-        tables_to_render = relevant
+            tables_to_render.update(edges.get(table, ()))
     else:
-        tables_to_render = set(schema.get('tables', {}).keys())
+        tables_to_render = set(tables_dict)
     
     lines = ["erDiagram"]
     
     # Add relationships
-    for table in tables_to_render:
-        if table not in schema.get('tables', {}):
+    for table, refs in edges.items():
+        if table not in tables_to_render:
             continue
-            
-        table_info = schema['tables'][table]
-        fks = table_info.get('foreign_keys', [])
-        
-        for fk in fks:
-            ref_table = fk.get('references_table')
-            if ref_table and ref_table in tables_to_render:
+        upper_table = upper_names[table]
+        for ref_table in refs:
+            if ref_table in tables_to_render:
                 # Standard one-to-many relationship notation
-                lines.append(f"    {table.upper()} ||--o{{ {ref_table.upper()} : references")
+                lines.append(f"    {upper_table} ||--o{{ {upper_names[ref_table]} : references")
     
     # Add entities with columns
     for table in sorted(tables_to_render):
-        if table not in schema.get('tables', {}):
+        if table not in tables_dict:
             continue
             
-        table_info = schema['tables'][table]
-        lines.append(f"\n    {table.upper()} {{")
+        table_info = tables_dict[table]
+        lines.append(f"\n    {upper_names[table]} {{")
         
         # Track primary keys
         pk_columns = set()
@@ -70,61 +126,95 @@ def generate_erd(schema, tables=None):
     return "\n".join(lines)
 
 
-def generate_lineage(schema, table_name=None):
-    """Generate data lineage diagram."""
+def generate_lineage(schema, table_name=None, fk_index=None):
+    """Generate data lineage diagram.
+    
+    Callers rendering many tables from one schema can pass the result of
+    _build_fk_index(schema) as fk_index to skip rebuilding it per call.
+    """
+    if fk_index is None:
+        fk_index = _build_fk_index(schema)
+    tables_dict, upper_names, edges, reverse_edges = fk_index
     
     lines = ["graph LR"]
     
-    if table_name and table_name in schema.get('tables', {}):
+    if table_name and table_name in tables_dict:
         # Focus on specific table lineage
-        table_info = schema['tables'][table_name]
+        upper_table = upper_names[table_name]
         
         # Show upstream (tables this table references)
-        for fk in table_info.get('foreign_keys', []):
-            ref_table = fk.get('references_table')
-            lines.append(f"    {ref_table.upper()} -->|FK| {table_name.upper()}")
+        for ref_table in edges[table_name]:
+            lines.append(f"    {upper_names[ref_table]} -->|FK| {upper_table}")
         
         # Show downstream (tables that reference this table)
-        for other_table, other_info in schema.get('tables', {}).items():
+        for other_table in reverse_edges.get(table_name, ()):
             if other_table != table_name:
-                for fk in other_info.get('foreign_keys', []):
-                    if fk.get('references_table') == table_name:
-                        lines.append(f"    {table_name.upper()} -->|FK| {other_table.upper()}")
+                lines.append(f"    {upper_table} -->|FK| {upper_names[other_table]}")
     else:
         # Show all lineage
-        for table, table_info in schema.get('tables', {}).items():
-            for fk in table_info.get('foreign_keys', []):
-                ref_table = fk.get('references_table')
-                if ref_table in schema.get('tables', {}):
-                    lines.append(f"    {ref_table.upper()} -->|FK| {table.upper()}")
+        for table, refs in edges.items():
+            for ref_table in refs:
+                if ref_table in tables_dict:
+                    lines.append(f"    {upper_names[ref_table]} -->|FK| {upper_names[table]}")
     
     return "\n".join(lines)
 
 
 def generate_query_plan(plan_data):
-    """Generate query execution plan diagram."""
+    """Generate query execution plan diagram.
+    
+    Nodes are visited depth-first with an explicit stack, so deep plans do
+    not hit the recursion limit, and numbered in visiting order.
+    """
     
     lines = ["graph TD"]
     
-    def add_node(node, parent=None):
-        node_id = f"node_{id(node)}"
-        node_type = node.get('type', 'Unknown')
-        details = node.get('details', '')
+    stack = [(plan_data, None)] if plan_data else []
+    next_id = 0
+    while stack:
+        node, parent = stack.pop()
+        node_id = f"node_{next_id}"
+        next_id += 1
+        node_type = str(node.get('type', 'Unknown')).translate(_MERMAID_ESCAPE)
+        details = str(node.get('details', '')).translate(_MERMAID_ESCAPE)
         
         lines.append(f"    {node_id}[{node_type}<br/>{details}]")
         
         if parent:
             lines.append(f"    {parent} --> {node_id}")
         
-        for child in node.get('children', []):
-            add_node(child, node_id)
-    
-    if plan_data:
-        add_node(plan_data)
+        # Push children reversed so the first child is visited first
+        stack.extend((child, node_id) for child in reversed(node.get('children', [])))
     
     return "\n".join(lines)
 
 
+def encode_pako(mermaid_content):
+    """Encode a diagram for a mermaid.live #pako: URL.
+    
+    The editor state is zlib-deflated and base64url-encoded without padding,
+    matching the editor's own pako.deflate + base64url encoding.
+    """
+    state = json.dumps({
+        "code": mermaid_content,
+        "mermaid": json.dumps({"theme": "default"}),
+        "autoSync": True,
+        "updateDiagram": True,
+    })
+    compressed = zlib.compress(state.encode('utf-8'), 9)
+    return base64.urlsafe_b64encode(compressed).decode('ascii').rstrip('=')
+
+
+def _open_in_browser(url):
+    """Browser thread target: open url and report the outcome, since the caller has moved on."""
+    try:
+        webbrowser.open(url)
+    except Exception as e:
+        print(f"⚠ Could not open browser: {e}")
+    else:
+        print(f"✓ Opened in browser: mermaid.live")
+
+
 def save_and_open(mermaid_content, output_path, open_browser=True):
     """Save .mmd file and optionally open in browser."""
     
@@ -138,12 +228,11 @@ def save_and_open(mermaid_content, output_path, open_browser=True):
     print(f"✓ Generated: {output_path}")
     
     if open_browser:
-        # Open with mermaid.live
+        # Open with mermaid.live; the browser launch runs in the background so
+        # the CLI is not blocked on it (non-daemon, so it still completes at exit)
         try:
-            encoded = urllib.parse.quote(mermaid_content, safe='')
-            url = f"https://mermaid.live/edit#pako:{encoded}"
-            webbrowser.open(url)
-            print(f"✓ Opened in browser: mermaid.live")
+            url = f"https://mermaid.live/edit#pako:{encode_pako(mermaid_content)}"
+            threading.Thread(target=_open_in_browser, args=(url,), name=BROWSER_THREAD_NAME).start()
         except Exception as e:
             print(f"⚠ Could not open browser: {e}")
     
@@ -155,7 +244,7 @@ def main():
     parser.add_argument('type', choices=['schema', 'erd', 'lineage', 'query-plan'],
                        help='Type of diagram to generate')
     parser.add_argument('--schema-file', required=True,
-                       help='Path to schema JSON file')
+                       help='Path to schema JSON file (- for stdin)')
     parser.add_argument('--output', required=True,
                        help='Output path for .mmd file')
     parser.add_argument('--tables', 
@@ -171,8 +260,7 @@ def main():
     
     # Load schema
     try:
-        with open(args.schema_file, 'r') as f:
-            schema = json.load(f)
+        schema = load_json(args.schema_file)
     except FileNotFoundError:
         print(f"✗ Schema file not found: {args.schema_file}")
         return 1
@@ -191,8 +279,7 @@ def main():
             print("✗ --query-plan-file required for query-plan type")
             return 1
         try:
-            with open(args.query_plan_file, 'r') as f:
-                plan_data = json.load(f)
+            plan_data = load_json(args.query_plan_file)
             mermaid = generate_query_plan(plan_data)
         except FileNotFoundError:
             print(f"✗ Query plan file not found: {args.query_plan_file}")
@@ -2,65 +2,201 @@
 """
 Validate SQL queries for safety and correctness.
 Usage: python validate_query.py --query "SQL" [--strict]
+       python validate_query.py --batch-file queries.sql [--strict]
 """
 
 import re
+import sys
 import argparse
-from typing import List, Tuple, Dict
+import functools
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List, Tuple, Dict, Optional, Set, FrozenSet
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Queries longer than this skip both the validate() and detect_dangerous()
+# caches, so each cache's 4096 entries pin at most about 8 MiB of query text
+# (the same strings, when detect_dangerous() is reached through validate())
+CACHE_MAX_QUERY_LENGTH = 2 * 1024
+
+# Joins queries for the single validate_many scan; no dangerous pattern can
+# match across it (\x00 is neither \s nor part of any keyword)
+BATCH_SEPARATOR = '\x00'
+
+# Fixed pieces of the get_summary report
+_SUMMARY_QUERY_TYPE = "Query Type: %s"
+_SUMMARY_WRITE_YES = "Write Operation: Yes"
+_SUMMARY_WRITE_NO = "Write Operation: No"
+_SUMMARY_VALID_YES = "Valid: ✓"
+_SUMMARY_VALID_NO = "Valid: ✗"
+_SUMMARY_ERRORS_HEADER = "\nERRORS:"
+_SUMMARY_ERROR_PREFIX = "  ✗ "
+_SUMMARY_WARNINGS_HEADER = "\nWARNINGS:"
+_SUMMARY_WARNING_PREFIX = "  ⚠ "
+
+
+class WarnCode:
+    """Short tags for the dangerous-pattern categories in QueryValidator.warning_codes."""
+    DROP_AFTER_SEMI = 'semi_drop'
+    DELETE_AFTER_SEMI = 'semi_delete'
+    LINE_COMMENT = 'line_comment'
+    BLOCK_COMMENT = 'block_comment'
+    UNION_SELECT = 'union_select'
+    SLEEP = 'sleep'
+    BENCHMARK = 'benchmark'
+
+
+def _has_line_comment(query: str) -> bool:
+    """str-method equivalent of the LINE_COMMENT regex r'--\\s*$'."""
+    return query.rstrip().endswith('--')
+
+
+def _has_block_comment(query: str) -> bool:
+    """str-method equivalent of the BLOCK_COMMENT regex r'/\\*.*\\*/' ('.' stops at newlines)."""
+    start = query.find('/*')
+    while start != -1:
+        line_end = query.find('\n', start)
+        if line_end == -1:
+            line_end = len(query)
+        if query.find('*/', start + 2, line_end) != -1:
+            return True
+        start = query.find('/*', line_end)
+    return False
+
+
+# Dangerous patterns that are plain literal probes, checked with str methods
+# instead of the regex scan
+LITERAL_DANGEROUS_CHECKS = {
+    WarnCode.LINE_COMMENT: _has_line_comment,
+    WarnCode.BLOCK_COMMENT: _has_block_comment,
+}
 
 
 class QueryValidator:
     """Validates SQL queries for safety issues."""
     
-    # Patterns that indicate write operations
-    WRITE_PATTERNS = [
-        r'^\s*INSERT\s+INTO',
-        r'^\s*UPDATE\s+',
-        r'^\s*DELETE\s+FROM',
-        r'^\s*DELETE\s+',
-        r'^\s*TRUNCATE\s+TABLE',
-        r'^\s*DROP\s+',
-        r'^\s*ALTER\s+TABLE',
-        r'^\s*CREATE\s+',
-        r'^\s*GRANT\s+',
-        r'^\s*REVOKE\s+',
-    ]
-    
-    # Dangerous patterns that might indicate injection or errors
-    DANGEROUS_PATTERNS = [
-        (r';\s*DROP\s+', 'Potential SQL injection: DROP after semicolon'),
-        (r';\s*DELETE\s+', 'Potential SQL injection: DELETE after semicolon'),
-        (r'--\s*$', 'Comment injection attempt'),
-        (r'/\*.*\*/', 'Block comment (potential injection)'),
-        (r'UNION\s+SELECT', 'UNION SELECT (potential data extraction)'),
-        (r'SLEEP\s*\(', 'SLEEP function (potential DoS)'),
-        (r'BENCHMARK\s*\(', 'BENCHMARK function (potential DoS)'),
-    ]
-    
-    # Common mistakes
-    COMMON_MISTAKES = [
-        (r'SELECT\s+\*\s+FROM\s+\w+\s*$', 'Missing WHERE clause on SELECT *'),
-        (r'WHERE\s+\w+\s*=\s*NULL', 'Use IS NULL instead of = NULL'),
-        (r'GROUP\s+BY\s+\w+\s+SELECT\s+.*[^,]\s+\w+\s*,', 'Missing aggregation on non-GROUP BY column'),
-    ]
+    # Leading keywords of write statements (case-folded, see _fold), each
+    # mapped to the word that must start the next token ('' = anything, as
+    # long as whitespace follows the keyword)
+    WRITE_KEYWORDS = {
+        'insert': 'into',
+        'update': '',
+        'delete': '',
+        'truncate': 'table',
+        'drop': '',
+        'alter': 'table',
+        'create': '',
+        'grant': '',
+        'revoke': '',
+    }
+    
+    # CTEs that end in a write statement
+    CTE_WRITE_PATTERN = re.compile(r'WITH\s+\w+\s+AS\s*\(.*\)\s*(INSERT|UPDATE|DELETE)',
+                                   re.IGNORECASE | re.DOTALL)
+    
+    # Dangerous patterns that might indicate injection or errors, each keyed
+    # by its WarnCode and with the lowercase literals a match requires (see _fold)
+    DANGEROUS_PATTERNS = (
+        (WarnCode.DROP_AFTER_SEMI, r';\s*DROP\s+', 'Potential SQL injection: DROP after semicolon', (';', 'drop')),
+        (WarnCode.DELETE_AFTER_SEMI, r';\s*DELETE\s+', 'Potential SQL injection: DELETE after semicolon',
+         (';', 'delete')),
+        (WarnCode.LINE_COMMENT, r'--\s*$', 'Comment injection attempt', ('--',)),
+        (WarnCode.BLOCK_COMMENT, r'/\*.*\*/', 'Block comment (potential injection)', ('/*', '*/')),
+        (WarnCode.UNION_SELECT, r'UNION\s+SELECT', 'UNION SELECT (potential data extraction)', ('union', 'select')),
+        (WarnCode.SLEEP, r'SLEEP\s*\(', 'SLEEP function (potential DoS)', ('sleep',)),
+        (WarnCode.BENCHMARK, r'BENCHMARK\s*\(', 'BENCHMARK function (potential DoS)', ('benchmark',)),
+    )
+    
+    # The other dangerous patterns in one pass: each alternative is a
+    # lookahead so overlapping hits (e.g. UNION SELECT inside a block comment)
+    # are all seen, and the named group that matched says which pattern fired
+    DANGEROUS_SCAN = re.compile('|'.join(f'(?=(?P<{name}>{pattern}))'
+                                         for name, pattern, _, _ in DANGEROUS_PATTERNS
+                                         if name not in LITERAL_DANGEROUS_CHECKS),
+                                re.IGNORECASE)
+    
+    # Common mistakes, with required literals as above
+    COMMON_MISTAKES = [(re.compile(p, re.IGNORECASE), msg, keywords) for p, msg, keywords in (
+        (r'SELECT\s+\*\s+FROM\s+\w+\s*$', 'Missing WHERE clause on SELECT *', ('select', '*', 'from')),
+        (r'WHERE\s+\w+\s*=\s*NULL', 'Use IS NULL instead of = NULL', ('where', 'null')),
+        (r'GROUP\s+BY\s+\w+\s+SELECT\s+.*[^,]\s+\w+\s*,', 'Missing aggregation on non-GROUP BY column',
+         ('group', 'select')),
+    )]
+    
+    # Query type by leading keyword (case-folded). Keywords match as a
+    # prefix of the query, so they are looked up longest first
+    QUERY_TYPES = {
+        'select': 'SELECT',
+        'insert': 'INSERT',
+        'update': 'UPDATE',
+        'delete': 'DELETE',
+        'create': 'CREATE',
+        'drop': 'DROP',
+        'alter': 'ALTER',
+        'with': 'CTE',
+    }
+    QUERY_TYPE_LENGTHS = sorted({len(keyword) for keyword in QUERY_TYPES}, reverse=True)
     
     def __init__(self, strict: bool = False):
         self.strict = strict
         self.warnings: List[str] = []
         self.errors: List[str] = []
+        # WarnCodes of the dangerous patterns found, in strict mode too
+        self.warning_codes: Set[str] = set()
     
     def validate(self, query: str) -> Dict:
-        """Run all validation checks on a query."""
+        """Run all validation checks on a query.
+        
+        Results for the base validator are memoized per (query, strict), so
+        repeated validation of the same SQL skips the pattern scans. Empty and
+        whitespace-only queries skip every check.
+        """
+        if not query or query.isspace():
+            self.errors = []
+            self.warnings = []
+            self.warning_codes = set()
+            return {
+                'is_write': False,
+                'is_valid': True,
+                'errors': self.errors,
+                'warnings': self.warnings,
+                'query_type': 'OTHER'
+            }
+        
+        if type(self) is not QueryValidator or len(query) > CACHE_MAX_QUERY_LENGTH:
+            return self._run_checks(query)
+        
+        is_write, errors, warnings, warning_codes, query_type = _cached_validate(query, self.strict)
+        self.errors = list(errors)
+        self.warnings = list(warnings)
+        self.warning_codes = set(warning_codes)
+        return {
+            'is_write': is_write,
+            'is_valid': not errors,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'query_type': query_type
+        }
+    
+    def _run_checks(self, query: str, dangerous_hits: Optional[Set[str]] = None) -> Dict:
+        """Run every check on a query without consulting the cache.
+        
+        dangerous_hits, when given, are the dangerous-pattern names already
+        found in the query (see validate_many).
+        """
         self.warnings = []
         self.errors = []
+        self.warning_codes = set()
         
         # Check for write operations
         is_write = self._detect_write_operation(query)
         
-        # Check for dangerous patterns
-        self._check_dangerous_patterns(query)
-        
-        # Check for common mistakes
+        # Check for dangerous patterns and common mistakes
+        self._check_dangerous_patterns(query, dangerous_hits)
         self._check_common_mistakes(query)
         
         # Check query structure
@@ -76,32 +212,36 @@ class QueryValidator:
     
     def _detect_write_operation(self, query: str) -> bool:
         """Detect if query is a write operation."""
-        query_upper = query.strip().upper()
-        
-        for pattern in self.WRITE_PATTERNS:
-            if re.search(pattern, query_upper, re.IGNORECASE):
-                return True
-        
-        # Check for CTEs with writes
-        if re.search(r'WITH\s+\w+\s+AS\s*\(.*\)\s*(INSERT|UPDATE|DELETE)', 
-                     query_upper, re.IGNORECASE | re.DOTALL):
-            return True
+        return detect_write(query)
+    
+    @staticmethod
+    def _fold(query: str) -> str:
+        """Case-fold a query for the keyword lookups and literal prefilters.
         
-        return False
+        casefold() maps everything re.IGNORECASE treats as equal to the ASCII
+        keyword letters (e.g. the Kelvin sign, long s) except dotless i and
+        dotted capital I, which it leaves as 'ı' and 'i̇' respectively.
+        """
+        return query.replace('\u0130', 'i').casefold().replace('\u0131', 'i')
     
-    def _check_dangerous_patterns(self, query: str):
-        """Check for potentially dangerous SQL patterns."""
-        for pattern, message in self.DANGEROUS_PATTERNS:
-            if re.search(pattern, query, re.IGNORECASE):
-                if self.strict:
-                    self.errors.append(f"DANGER: {message}")
-                else:
-                    self.warnings.append(f"WARNING: {message}")
+    def _check_dangerous_patterns(self, query: str, hits: Optional[Set[str]] = None):
+        """Check for potentially dangerous SQL patterns, or report hits found by the caller."""
+        if hits is not None:
+            warnings, errors, codes = _dangerous_report(hits, self.strict)
+        elif len(query) <= CACHE_MAX_QUERY_LENGTH:
+            warnings, errors, codes = detect_dangerous(query, self.strict)
+        else:
+            warnings, errors, codes = detect_dangerous.__wrapped__(query, self.strict)
+        self.warnings += warnings
+        self.errors += errors
+        self.warning_codes |= codes
     
-    def _check_common_mistakes(self, query: str):
+    def _check_common_mistakes(self, query: str, folded: Optional[str] = None):
         """Check for common SQL mistakes."""
-        for pattern, message in self.COMMON_MISTAKES:
-            if re.search(pattern, query, re.IGNORECASE):
+        if folded is None:
+            folded = self._fold(query)
+        for pattern, message, keywords in self.COMMON_MISTAKES:
+            if all(kw in folded for kw in keywords) and pattern.search(query):
                 self.warnings.append(message)
     
     def _check_structure(self, query: str):
@@ -112,86 +252,195 @@ class QueryValidator:
         if open_parens != close_parens:
             self.errors.append(f"Syntax: Unmatched parentheses ({open_parens} open, {close_parens} close)")
         
-        # Check for unmatched quotes
-        single_quotes = query.count("'") - query.count("\\'")
+        # Check for unmatched quotes; escaped quotes only need counting
+        # when the query contains a backslash at all
+        single_quotes = query.count("'")
+        if single_quotes and '\\' in query:
+            single_quotes -= query.count("\\'")
         if single_quotes % 2 != 0:
             self.errors.append("Syntax: Unmatched single quotes")
-        
-        # Check for SELECT without FROM (unless it's a simple expression)
-        if re.search(r'SELECT\s+', query, re.IGNORECASE) and \
-           not re.search(r'SELECT\s+.*\s+FROM\s+', query, re.IGNORECASE) and \
-           not re.search(r'SELECT\s+\d+\s*$', query, re.IGNORECASE):
-            # Might be valid (e.g., SELECT 1), but flag as warning
-            pass
     
     def _classify_query(self, query: str) -> str:
         """Classify the type of query."""
-        query_upper = query.strip().upper()
-        
-        if re.search(r'^\s*SELECT', query_upper):
-            return 'SELECT'
-        elif re.search(r'^\s*INSERT', query_upper):
-            return 'INSERT'
-        elif re.search(r'^\s*UPDATE', query_upper):
-            return 'UPDATE'
-        elif re.search(r'^\s*DELETE', query_upper):
-            return 'DELETE'
-        elif re.search(r'^\s*CREATE', query_upper):
-            return 'CREATE'
-        elif re.search(r'^\s*DROP', query_upper):
-            return 'DROP'
-        elif re.search(r'^\s*ALTER', query_upper):
-            return 'ALTER'
-        elif re.search(r'^\s*WITH', query_upper):
-            return 'CTE'
-        else:
-            return 'OTHER'
+        head = self._fold(query.lstrip()[:self.QUERY_TYPE_LENGTHS[0]])
+        for length in self.QUERY_TYPE_LENGTHS:
+            query_type = self.QUERY_TYPES.get(head[:length])
+            if query_type:
+                return query_type
+        
+        return 'OTHER'
     
     def get_summary(self, result: Dict) -> str:
         """Generate human-readable summary of validation."""
-        lines = []
-        
-        lines.append(f"Query Type: {result['query_type']}")
-        lines.append(f"Write Operation: {'Yes' if result['is_write'] else 'No'}")
-        lines.append(f"Valid: {'✓' if result['is_valid'] else '✗'}")
+        lines = [
+            _SUMMARY_QUERY_TYPE % (result['query_type'],),
+            _SUMMARY_WRITE_YES if result['is_write'] else _SUMMARY_WRITE_NO,
+            _SUMMARY_VALID_YES if result['is_valid'] else _SUMMARY_VALID_NO,
+        ]
         
         if result['errors']:
-            lines.append("\nERRORS:")
-            for error in result['errors']:
-                lines.append(f"  ✗ {error}")
+            lines.append(_SUMMARY_ERRORS_HEADER)
+            lines.extend([_SUMMARY_ERROR_PREFIX + error for error in result['errors']])
         
         if result['warnings']:
-            lines.append("\nWARNINGS:")
-            for warning in result['warnings']:
-                lines.append(f"  ⚠ {warning}")
+            lines.append(_SUMMARY_WARNINGS_HEADER)
+            lines.extend([_SUMMARY_WARNING_PREFIX + warning for warning in result['warnings']])
         
         return "\n".join(lines)
 
 
-def check_batch_size(query: str, estimated_rows: int, threshold: int = 1000) -> Dict:
-    """Check if operation affects too many rows."""
-    validator = QueryValidator()
-    is_write = validator._detect_write_operation(query)
+# Interned (warning, strict-mode error) text for each dangerous pattern, so
+# every report shares the same string objects
+_DANGEROUS_MESSAGES = {
+    name: (sys.intern(f"WARNING: {message}"), sys.intern(f"DANGER: {message}"))
+    for name, _, message, _ in QueryValidator.DANGEROUS_PATTERNS
+}
+
+
+def detect_write(query: str) -> bool:
+    """Detect if query is a write operation, from its leading keyword or a CTE ending in a write."""
+    # The keyword must be followed by another token; a bare "DROP " is not a write
+    tokens = query.split(None, 1)
+    if len(tokens) > 1:
+        follower = QueryValidator.WRITE_KEYWORDS.get(QueryValidator._fold(tokens[0]))
+        if follower is not None:
+            if not follower:
+                return True
+            if QueryValidator._fold(tokens[1][:len(follower)]) == follower:
+                return True
     
-    if is_write and estimated_rows > threshold:
-        return {
-            'is_batch': True,
-            'affected_rows': estimated_rows,
-            'threshold': threshold,
-            'warning': f"This operation affects {estimated_rows} rows (threshold: {threshold})",
-            'suggestion': "Consider adding WHERE clause or LIMIT"
-        }
+    # Check for CTEs with writes
+    if QueryValidator.CTE_WRITE_PATTERN.search(query):
+        return True
+    
+    return False
+
+
+def _scan_dangerous(query: str) -> Set[str]:
+    """Return the names of the dangerous patterns found in a query.
+    
+    LITERAL_DANGEROUS_CHECKS run first. The rest use the Hyperscan database
+    when it is available and the query is ASCII (so its byte offsets and
+    case folding agree with re), and DANGEROUS_SCAN otherwise.
+    """
+    hits = {name for name, check in LITERAL_DANGEROUS_CHECKS.items() if check(query)}
+    if _DANGEROUS_DB is not None and query.isascii():
+        ids: Set[int] = set()
+        _DANGEROUS_DB.scan(query.encode('ascii'),
+                           match_event_handler=lambda id_, start, end, flags, context: ids.add(id_))
+        hits.update(QueryValidator.DANGEROUS_PATTERNS[i][0] for i in ids)
+    else:
+        hits.update(match.lastgroup for match in QueryValidator.DANGEROUS_SCAN.finditer(query))
+    return hits
+
+
+@functools.lru_cache(maxsize=4096)
+def detect_dangerous(query: str, strict: bool) -> Tuple[Tuple[str, ...], Tuple[str, ...], FrozenSet[str]]:
+    """Find dangerous patterns in a query and return (warnings, errors, warning_codes).
+    
+    Strict mode reports every hit as an error, otherwise as a warning.
+    """
+    folded = QueryValidator._fold(query)
+    if not any(all(kw in folded for kw in keywords) for _, _, _, keywords in QueryValidator.DANGEROUS_PATTERNS):
+        return (), (), frozenset()
+    
+    return _dangerous_report(_scan_dangerous(query), strict)
+
+
+def _dangerous_report(hits: Set[str], strict: bool) -> Tuple[Tuple[str, ...], Tuple[str, ...], FrozenSet[str]]:
+    """Turn dangerous-pattern names into (warnings, errors, warning_codes), in pattern order."""
+    kind = 1 if strict else 0
+    messages = tuple(_DANGEROUS_MESSAGES[name][kind] for name, _, _, _ in QueryValidator.DANGEROUS_PATTERNS
+                     if name in hits)
+    if strict:
+        return (), messages, frozenset(hits)
+    return messages, (), frozenset(hits)
+
+
+def _compile_dangerous_db():
+    """Compile the scanned DANGEROUS_PATTERNS into a Hyperscan database keyed by pattern index."""
+    scanned = [(i, pattern) for i, (name, pattern, _, _) in enumerate(QueryValidator.DANGEROUS_PATTERNS)
+               if name not in LITERAL_DANGEROUS_CHECKS]
+    # re's \s also matches the \x1c-\x1f separators; Hyperscan's does not
+    expressions = [pattern.replace(r'\s', r'[\s\x1c-\x1f]').encode('ascii') for _, pattern in scanned]
+    db = hyperscan.Database()
+    db.compile(expressions=expressions,
+               ids=[i for i, _ in scanned],
+               flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(scanned))
+    return db
+
+
+_DANGEROUS_DB = _compile_dangerous_db() if hyperscan is not None else None
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_validate(query: str, strict: bool) -> Tuple[bool, Tuple[str, ...], Tuple[str, ...],
+                                                       FrozenSet[str], str]:
+    """Validate a query and return an immutable (is_write, errors, warnings, warning_codes, query_type)."""
+    validator = QueryValidator(strict=strict)
+    result = validator._run_checks(query)
+    return (result['is_write'], tuple(result['errors']), tuple(result['warnings']),
+            frozenset(validator.warning_codes), result['query_type'])
+
+
+def lru_cache_clear() -> None:
+    """Drop every memoized validate() and detect_dangerous() result, e.g. before a test that inspects the checks."""
+    _cached_validate.cache_clear()
+    detect_dangerous.cache_clear()
+
+
+def validate_many(queries: List[str], strict: bool = False) -> List[Dict]:
+    """Validate several queries, returning the same results as validate() on each.
     
-    return {
-        'is_batch': False,
+    DANGEROUS_SCAN runs once over the queries joined by BATCH_SEPARATOR and
+    each hit is assigned to its query by offset; the other checks run per
+    query.
+    """
+    hits: List[Set[str]] = [{name for name, check in LITERAL_DANGEROUS_CHECKS.items() if check(query)}
+                            for query in queries]
+    # Offset just past each query's separator
+    ends = list(accumulate(len(query) + 1 for query in queries))
+    for match in QueryValidator.DANGEROUS_SCAN.finditer(BATCH_SEPARATOR.join(queries)):
+        hits[bisect_right(ends, match.start())].add(match.lastgroup)
+    
+    results = []
+    for query, query_hits in zip(queries, hits):
+        validator = QueryValidator(strict=strict)
+        if not query or query.isspace():
+            results.append(validator.validate(query))
+        else:
+            results.append(validator._run_checks(query, query_hits))
+    return results
+
+
+def check_batch_size(query: str, estimated_rows: int, threshold: int = 1000) -> Dict:
+    """Check if operation affects too many rows."""
+    # The row count is compared first so small operations never parse the query
+    is_batch = estimated_rows > threshold and detect_write(query)
+    result = {
+        'is_batch': is_batch,
         'affected_rows': estimated_rows
     }
+    if is_batch:
+        result['threshold'] = threshold
+        result['warning'] = f"This operation affects {estimated_rows} rows (threshold: {threshold})"
+        result['suggestion'] = "Consider adding WHERE clause or LIMIT"
+    return result
+
+
+def read_batch_file(path: str) -> List[str]:
+    """Read newline-delimited queries from a file, skipping blank lines."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
 
 
 def main():
     parser = argparse.ArgumentParser(description='Validate SQL queries for safety')
-    parser.add_argument('--query', '-q', required=True,
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--query', '-q',
                        help='SQL query to validate')
+    source.add_argument('--batch-file',
+                       help='File of newline-delimited queries to validate in one run')
     parser.add_argument('--strict', action='store_true',
                        help='Treat warnings as errors')
     parser.add_argument('--check-batch', action='store_true',
@@ -201,24 +450,34 @@ def main():
     
     args = parser.parse_args()
     
-    # Validate
+    if args.batch_file:
+        try:
+            queries = read_batch_file(args.batch_file)
+        except FileNotFoundError:
+            print(f"✗ Batch file not found: {args.batch_file}")
+            return 1
+    else:
+        queries = [args.query]
+    
     validator = QueryValidator(strict=args.strict)
-    result = validator.validate(args.query)
-    
-    # Check batch size if requested
-    if args.check_batch and args.estimated_rows > 0:
-        batch_check = check_batch_size(args.query, args.estimated_rows)
-        if batch_check['is_batch']:
-            result['warnings'].append(batch_check['warning'])
-            result['warnings'].append(f"Suggestion: {batch_check['suggestion']}")
-    
-    # Output
-    print(validator.get_summary(result))
-    
-    # Exit code
-    if result['errors']:
-        return 1
-    return 0
+    exit_code = 0
+    for i, (query, result) in enumerate(zip(queries, validate_many(queries, args.strict)), 1):
+        # Check batch size if requested
+        if args.check_batch and args.estimated_rows > 0:
+            batch_check = check_batch_size(query, args.estimated_rows)
+            if batch_check['is_batch']:
+                result['warnings'].append(batch_check['warning'])
+                result['warnings'].append(f"Suggestion: {batch_check['suggestion']}")
+        
+        # Output
+        if args.batch_file:
+            print(f"=== QUERY {i} ===")
+        print(validator.get_summary(result))
+        
+        # Exit code
+        if result['errors']:
+            exit_code = 1
+    return exit_code
 
 
 if __name__ == '__main__':
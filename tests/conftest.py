@@ -1,174 +1,419 @@
 """
 Pytest configuration and shared fixtures for DeepDive test suite.
+
+Modules only the file fixtures need are imported inside them, keeping
+conftest import (and so collection) light.
 """
 
-import json
-import pytest
-import tempfile
 import os
+import sys
+import pytest
+from collections.abc import Mapping
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Tuple
+from types import MappingProxyType
 
+# Make the CLI scripts importable from fixtures
+SCRIPTS_DIR = str(Path(__file__).resolve().parents[1] / 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
 
-@pytest.fixture
-def sample_sql_queries():
-    """Sample SQL queries for testing."""
-    return {
-        "select_valid": "SELECT id, name FROM users WHERE active = true",
-        "select_with_wildcard": "SELECT * FROM users",
-        "select_without_where": "SELECT * FROM users",
-        "select_numeric": "SELECT 1",
-        "select_expression": "SELECT 1 + 2",
-        "insert_into": "INSERT INTO users (name, email) VALUES ('test', 'test@test.com')",
-        "insert_values": "INSERT INTO users VALUES (1, 'test')",
-        "update_basic": "UPDATE users SET name = 'new' WHERE id = 1",
-        "update_no_where": "UPDATE users SET active = false",
-        "delete_from": "DELETE FROM users WHERE id = 1",
-        "delete_no_where": "DELETE FROM users",
-        "truncate_table": "TRUNCATE TABLE users",
-        "drop_table": "DROP TABLE users",
-        "drop_database": "DROP DATABASE mydb",
-        "alter_table": "ALTER TABLE users ADD COLUMN age INT",
-        "create_table": "CREATE TABLE test (id INT, name VARCHAR(100))",
-        "grant_select": "GRANT SELECT ON users TO analyst",
-        "revoke_write": "REVOKE INSERT ON users FROM intern",
-        "cte_with_insert": "WITH new_users AS (INSERT INTO users VALUES (1)) SELECT * FROM users",
-        "cte_with_update": "WITH updated AS (UPDATE users SET active = true) SELECT * FROM users",
-        "dangerous_drop_after_semicolon": "SELECT 1; DROP TABLE users",
-        "dangerous_delete_after_semicolon": "SELECT 1; DELETE FROM users",
-        "comment_injection": "SELECT * FROM users -- WHERE 1=1",
-        "block_comment": "SELECT * /* comment */ FROM users",
-        "union_select": "SELECT * FROM users UNION SELECT * FROM admins",
-        "sleep_function": "SELECT SLEEP(5)",
-        "benchmark_function": "SELECT BENCHMARK(10000000, MD5('test'))",
-        "null_comparison": "SELECT * FROM users WHERE name = NULL",
-        "missing_group_by": "SELECT status, COUNT(*) FROM orders GROUP BY status",
-        "valid_group_by": "SELECT status, COUNT(*) FROM orders GROUP BY status, id",
-        "unmatched_parentheses": "SELECT * FROM users WHERE (id = 1",
-        "unmatched_quotes": "SELECT * FROM users WHERE name = 'test",
+
+@pytest.fixture(scope="session", autouse=True)
+def _warmup():
+    """Pay one-off import costs before the first test runs.
+    
+    Importing the scripts compiles their module-level regexes.
+    """
+    import json
+    import generate_chart  # noqa: F401
+    import generate_mermaid  # noqa: F401
+    import validate_query  # noqa: F401
+    json.dumps({})
+
+
+def _freeze(obj):
+    """Recursively turn lists into tuples so shared sample data can't be appended to."""
+    if isinstance(obj, list):
+        return tuple(_freeze(item) for item in obj)
+    if isinstance(obj, dict):
+        return {key: _freeze(value) for key, value in obj.items()}
+    return obj
+
+
+# name: sql per line, decoded lazily by _LazyQueries
+_SQL_BLOB = b"""\
+select_valid: SELECT id, name FROM users WHERE active = true
+select_with_wildcard: SELECT * FROM users
+select_numeric: SELECT 1
+select_expression: SELECT 1 + 2
+insert_into: INSERT INTO users (name, email) VALUES ('test', 'test@test.com')
+insert_values: INSERT INTO users VALUES (1, 'test')
+update_basic: UPDATE users SET name = 'new' WHERE id = 1
+update_no_where: UPDATE users SET active = false
+delete_from: DELETE FROM users WHERE id = 1
+delete_no_where: DELETE FROM users
+truncate_table: TRUNCATE TABLE users
+drop_table: DROP TABLE users
+drop_database: DROP DATABASE mydb
+alter_table: ALTER TABLE users ADD COLUMN age INT
+create_table: CREATE TABLE test (id INT, name VARCHAR(100))
+grant_select: GRANT SELECT ON users TO analyst
+revoke_write: REVOKE INSERT ON users FROM intern
+cte_with_insert: WITH new_users AS (INSERT INTO users VALUES (1)) SELECT * FROM users
+cte_with_update: WITH updated AS (UPDATE users SET active = true) SELECT * FROM users
+dangerous_drop_after_semicolon: SELECT 1; DROP TABLE users
+dangerous_delete_after_semicolon: SELECT 1; DELETE FROM users
+comment_injection: SELECT * FROM users -- WHERE 1=1
+block_comment: SELECT * /* comment */ FROM users
+union_select: SELECT * FROM users UNION SELECT * FROM admins
+sleep_function: SELECT SLEEP(5)
+benchmark_function: SELECT BENCHMARK(10000000, MD5('test'))
+null_comparison: SELECT * FROM users WHERE name = NULL
+missing_group_by: SELECT status, COUNT(*) FROM orders GROUP BY status
+valid_group_by: SELECT status, COUNT(*) FROM orders GROUP BY status, id
+unmatched_parentheses: SELECT * FROM users WHERE (id = 1
+unmatched_quotes: SELECT * FROM users WHERE name = 'test
+"""
+
+
+# Names that share another entry's SQL; looking one up returns the canonical
+# query, but iteration only yields canonical names so each SQL runs once
+_SQL_ALIASES = MappingProxyType({
+    "select_without_where": "select_with_wildcard",
+})
+
+
+class _LazyQueries(Mapping):
+    """Read-only mapping over _SQL_BLOB that decodes a query only when it is looked up."""
+    
+    def __init__(self, blob, aliases):
+        self._blob = blob
+        self.aliases = aliases
+        self._offsets = {}
+        start = 0
+        while start < len(blob):
+            end = blob.index(b"\n", start)
+            sep = blob.index(b": ", start, end)
+            self._offsets[blob[start:sep].decode()] = (sep + 2, end)
+            start = end + 1
+    
+    def __getitem__(self, key):
+        start, end = self._offsets[self.aliases.get(key, key)]
+        return self._blob[start:end].decode()
+    
+    def __iter__(self):
+        return iter(self._offsets)
+    
+    def __len__(self):
+        return len(self._offsets)
+
+
+_SQL_QUERIES = _LazyQueries(_SQL_BLOB, _SQL_ALIASES)
+
+
+_CHART_DATA = MappingProxyType(_freeze({
+    "empty": [],
+    "single_item": [{"category": "A", "value": 10}],
+    "small_dataset": [
+        {"category": "A", "value": 10},
+        {"category": "B", "value": 20},
+        {"category": "C", "value": 15},
+    ],
+    "temporal_line": [
+        {"date": "2024-01-01", "value": 100},
+        {"date": "2024-02-01", "value": 150},
+        {"date": "2024-03-01", "value": 200},
+    ],
+    "temporal_time": [
+        {"time": "08:00", "value": 50},
+        {"time": "09:00", "value": 75},
+    ],
+    "two_numeric": [
+        {"x": 1, "y": 10},
+        {"x": 2, "y": 20},
+        {"x": 3, "y": 30},
+    ],
+    "single_numeric": [
+        {"category": "A", "value": 10},
+        {"category": "B", "value": 20},
+    ],
+    "with_month": [
+        {"month": "January", "sales": 100},
+        {"month": "February", "sales": 150},
+    ],
+    "with_year": [
+        {"year": 2023, "revenue": 1000},
+        {"year": 2024, "revenue": 1500},
+    ],
+}))
+
+
+_SCHEMA = MappingProxyType(_freeze({
+    "tables": {
+        "users": {
+            "columns": [
+                {"name": "id", "type": "INT"},
+                {"name": "username", "type": "VARCHAR(50)"},
+                {"name": "email", "type": "VARCHAR(100)"},
+                {"name": "created_at", "type": "TIMESTAMP"},
+            ],
+            "primary_key": [{"column": "id"}],
+            "foreign_keys": [
+                {"column": "email", "references_table": "accounts", "references_column": "email"}
+            ],
+        },
+        "accounts": {
+            "columns": [
+                {"name": "email", "type": "VARCHAR(100)"},
+                {"name": "plan", "type": "VARCHAR(20)"},
+            ],
+            "primary_key": [{"column": "email"}],
+            "foreign_keys": [],
+        },
+        "orders": {
+            "columns": [
+                {"name": "id", "type": "INT"},
+                {"name": "user_id", "type": "INT"},
+                {"name": "total", "type": "DECIMAL(10,2)"},
+            ],
+            "primary_key": [{"column": "id"}],
+            "foreign_keys": [
+                {"column": "user_id", "references_table": "users", "references_column": "id"}
+            ],
+        },
+        "order_items": {
+            "columns": [
+                {"name": "id", "type": "INT"},
+                {"name": "order_id", "type": "INT"},
+                {"name": "product_id", "type": "INT"},
+                {"name": "quantity", "type": "INT"},
+            ],
+            "primary_key": [{"column": "id"}],
+            "foreign_keys": [
+                {"column": "order_id", "references_table": "orders", "references_column": "id"},
+                {"column": "product_id", "references_table": "products", "references_column": "id"},
+            ],
+        },
+        "products": {
+            "columns": [
+                {"name": "id", "type": "INT"},
+                {"name": "name", "type": "VARCHAR(100)"},
+                {"name": "price", "type": "DECIMAL(10,2)"},
+            ],
+            "primary_key": [{"column": "id"}],
+            "foreign_keys": [],
+        },
     }
+}))
 
 
-@pytest.fixture
-def sample_chart_data():
-    """Sample chart data for testing."""
-    return {
-        "empty": [],
-        "single_item": [{"category": "A", "value": 10}],
-        "small_dataset": [
-            {"category": "A", "value": 10},
-            {"category": "B", "value": 20},
-            {"category": "C", "value": 15},
-        ],
-        "temporal_line": [
-            {"date": "2024-01-01", "value": 100},
-            {"date": "2024-02-01", "value": 150},
-            {"date": "2024-03-01", "value": 200},
-        ],
-        "temporal_time": [
-            {"time": "08:00", "value": 50},
-            {"time": "09:00", "value": 75},
-        ],
-        "two_numeric": [
-            {"x": 1, "y": 10},
-            {"x": 2, "y": 20},
-            {"x": 3, "y": 30},
-        ],
-        "single_numeric": [
-            {"category": "A", "value": 10},
-            {"category": "B", "value": 20},
-        ],
-        "with_month": [
-            {"month": "January", "sales": 100},
-            {"month": "February", "sales": 150},
-        ],
-        "with_year": [
-            {"year": 2023, "revenue": 1000},
-            {"year": 2024, "revenue": 1500},
-        ],
+class _RecordAccess:
+    """Dict-style read access for the typed schema records, so code written
+    against the plain dict schema (record['name'], record.get(...)) still works."""
+    
+    __slots__ = ()
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+# __slots__ is spelled out because dataclass(slots=True) needs Python 3.10
+@dataclass(frozen=True)
+class Column(_RecordAccess):
+    __slots__ = ("name", "type")
+    name: str
+    type: str
+
+
+@dataclass(frozen=True)
+class KeyColumn(_RecordAccess):
+    __slots__ = ("column",)
+    column: str
+
+
+@dataclass(frozen=True)
+class ForeignKey(_RecordAccess):
+    __slots__ = ("column", "references_table", "references_column")
+    column: str
+    references_table: str
+    references_column: str
+
+
+@dataclass(frozen=True)
+class Table(_RecordAccess):
+    __slots__ = ("columns", "primary_key", "foreign_keys")
+    columns: Tuple[Column, ...]
+    primary_key: Tuple[KeyColumn, ...]
+    foreign_keys: Tuple[ForeignKey, ...]
+
+
+def _typed_schema(schema):
+    """Rebuild a dict schema from Table/Column/KeyColumn/ForeignKey records."""
+    tables = {
+        name: Table(
+            columns=tuple(Column(**col) for col in info.get("columns", ())),
+            primary_key=tuple(KeyColumn(**pk) for pk in info.get("primary_key", ())),
+            foreign_keys=tuple(ForeignKey(**fk) for fk in info.get("foreign_keys", ())),
+        )
+        for name, info in schema["tables"].items()
     }
+    return MappingProxyType({"tables": MappingProxyType(tables)})
 
 
-@pytest.fixture
+_SCHEMA_TYPED = _typed_schema(_SCHEMA)
+
+
+def pytest_configure(config):
+    """Register custom markers for runs that do not pick up tests/pytest.ini."""
+    config.addinivalue_line(
+        "markers",
+        'subprocess: spawns the scripts in a child interpreter (deselect with -m "not subprocess")',
+    )
+
+
+def pytest_generate_tests(metafunc):
+    """Inject the read-only sample SQL queries at collection time.
+    
+    sample_sql_queries is static data, so binding it as a session-scoped
+    parameter skips per-test fixture setup entirely.
+    """
+    if "sample_sql_queries" in metafunc.fixturenames:
+        metafunc.parametrize("sample_sql_queries", [_SQL_QUERIES], ids=["queries"], scope="session")
+
+
+@pytest.fixture(scope="session")
+def sample_chart_data():
+    """Sample chart data for testing (read-only, shared across the session)."""
+    return _CHART_DATA
+
+
+@pytest.fixture(scope="session")
 def sample_schema():
-    """Sample database schema for mermaid generation."""
-    return {
-        "tables": {
-            "users": {
-                "columns": [
-                    {"name": "id", "type": "INT"},
-                    {"name": "username", "type": "VARCHAR(50)"},
-                    {"name": "email", "type": "VARCHAR(100)"},
-                    {"name": "created_at", "type": "TIMESTAMP"},
-                ],
-                "primary_key": [{"column": "id"}],
-                "foreign_keys": [
-                    {"column": "email", "references_table": "accounts", "references_column": "email"}
-                ],
-            },
-            "accounts": {
-                "columns": [
-                    {"name": "email", "type": "VARCHAR(100)"},
-                    {"name": "plan", "type": "VARCHAR(20)"},
-                ],
-                "primary_key": [{"column": "email"}],
-                "foreign_keys": [],
-            },
-            "orders": {
-                "columns": [
-                    {"name": "id", "type": "INT"},
-                    {"name": "user_id", "type": "INT"},
-                    {"name": "total", "type": "DECIMAL(10,2)"},
-                ],
-                "primary_key": [{"column": "id"}],
-                "foreign_keys": [
-                    {"column": "user_id", "references_table": "users", "references_column": "id"}
-                ],
-            },
-            "order_items": {
-                "columns": [
-                    {"name": "id", "type": "INT"},
-                    {"name": "order_id", "type": "INT"},
-                    {"name": "product_id", "type": "INT"},
-                    {"name": "quantity", "type": "INT"},
-                ],
-                "primary_key": [{"column": "id"}],
-                "foreign_keys": [
-                    {"column": "order_id", "references_table": "orders", "references_column": "id"},
-                    {"column": "product_id", "references_table": "products", "references_column": "id"},
-                ],
-            },
-            "products": {
-                "columns": [
-                    {"name": "id", "type": "INT"},
-                    {"name": "name", "type": "VARCHAR(100)"},
-                    {"name": "price", "type": "DECIMAL(10,2)"},
-                ],
-                "primary_key": [{"column": "id"}],
-                "foreign_keys": [],
-            },
-        }
-    }
+    """Sample database schema for mermaid generation (read-only, shared across the session)."""
+    return _SCHEMA
+
+
+@pytest.fixture(scope="session")
+def sample_schema_typed():
+    """sample_schema built from frozen, slotted records instead of dicts."""
+    return _SCHEMA_TYPED
+
+
+def _json_default(obj):
+    """Serialize the read-only sample containers (mappings, slotted records)."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, _RecordAccess):
+        return {name: getattr(obj, name) for name in obj.__slots__}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps_json(data):
+    """Serialize fixture data to JSON bytes, using orjson when available."""
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.dumps(data, default=_json_default).encode()
+    return orjson.dumps(data, default=_json_default)
+
+
+@pytest.fixture(scope="session")
+def json_file_cache(tmp_path_factory):
+    """Session directory of serialized JSON payloads, one file per content digest.
+    
+    Under pytest-xdist all workers share one directory next to their own
+    base temp dirs, so each payload is written once per run.
+    """
+    if os.environ.get("PYTEST_XDIST_WORKER"):
+        path = tmp_path_factory.getbasetemp().parent / "json_cache"
+        path.mkdir(exist_ok=True)
+        return path
+    return tmp_path_factory.mktemp("json_cache")
+
+
+def _json_cache_entry(cache_dir, data):
+    """Return the cache file holding data's JSON, writing it on first use."""
+    import hashlib
+    
+    payload = _dumps_json(data)
+    cached = cache_dir / hashlib.blake2b(payload, digest_size=16).hexdigest()
+    if not cached.exists():
+        # Write then rename so concurrent workers never see a partial file;
+        # entries are read-only so a test writing to one fails loudly
+        partial = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+        partial.write_bytes(payload)
+        partial.chmod(0o444)
+        os.replace(partial, cached)
+    return cached
+
+
+@pytest.fixture(scope="session")
+def shared_json_file(json_file_cache):
+    """Session-scoped factory returning the cached JSON file for a payload.
+    
+    Every test asking for the same data gets the same path, so callers must
+    only read it (e.g. pass it to a CLI as an input file).
+    """
+    def _create(data):
+        return str(_json_cache_entry(json_file_cache, data))
+    return _create
 
 
 @pytest.fixture
-def temp_json_file():
-    """Create a temporary JSON file for testing."""
+def temp_json_file(tmp_path, json_file_cache):
+    """Factory that writes data to a JSON file under tmp_path and returns its path.
+    
+    Identical payloads are serialized once per session and copied into each
+    test's tmp_path, so a test may modify its own file freely.
+    """
+    import shutil
+    
     def _create(data, filename="test_data.json"):
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(data, f)
-            path = f.name
-        yield path
-        if os.path.exists(path):
-            os.unlink(path)
+        path = tmp_path / filename
+        shutil.copyfile(_json_cache_entry(json_file_cache, data), path)
+        return str(path)
     return _create
 
 
 @pytest.fixture
-def temp_output_file():
-    """Create a temporary output file path for testing."""
+def memory_json_file(temp_json_file):
+    """Factory like temp_json_file that keeps the JSON in an anonymous memfd.
+    
+    Returns a /proc/self/fd path, which is only valid inside this process, so
+    use it for in-process calls rather than subprocess CLIs. Falls back to
+    temp_json_file where memfd_create is unavailable.
+    """
+    if not hasattr(os, "memfd_create"):
+        yield temp_json_file
+        return
+    
+    fds = []
+    
+    def _create(data, filename="test_data.json"):
+        fd = os.memfd_create(filename, os.MFD_CLOEXEC)
+        fds.append(fd)
+        os.write(fd, _dumps_json(data))
+        return f"/proc/self/fd/{fd}"
+    
+    yield _create
+    for fd in fds:
+        os.close(fd)
+
+
+@pytest.fixture
+def temp_output_file(tmp_path):
+    """Factory that returns an output file path under tmp_path."""
+    base = str(tmp_path) + os.sep
+    
     def _create(filename="test_output.mmd"):
-        path = os.path.join(tempfile.gettempdir(), filename)
-        yield path
-        if os.path.exists(path):
-            os.unlink(path)
-    return _create
\ No newline at end of file
+        return base + filename
+    return _create
@@ -3,814 +3,432 @@ Integration tests for CLI execution of all three scripts.
 """
 
 import pytest
+import io
 import json
 import sys
 import os
+import re
 import subprocess
-import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import generate_chart
+import generate_mermaid
+import validate_query
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[2] / 'scripts'
+
+# Isolated mode skips PYTHON* env vars and the user site; site-packages stay
+# importable (-S is not used) so the optional orjson path is still exercised
+PYCMD = [sys.executable, '-I']
+
+CATEGORY_A = [{"category": "A", "value": 10}]
+
+EMPTY_SCHEMA = {"tables": {}}
+
+USERS_SCHEMA = {
+    "tables": {
+        "users": {
+            "columns": [{"name": "id", "type": "INT"}],
+            "primary_key": [],
+            "foreign_keys": [],
+        }
+    }
+}
+
+USERS_ORDERS_SCHEMA = {
+    "tables": {
+        "users": USERS_SCHEMA["tables"]["users"],
+        "orders": {
+            "columns": [
+                {"name": "id", "type": "INT"},
+                {"name": "user_id", "type": "INT"},
+            ],
+            "primary_key": [],
+            "foreign_keys": [
+                {"column": "user_id", "references_table": "users", "references_column": "id"}
+            ],
+        },
+    }
+}
+
+RICH_SCHEMA = {
+    "tables": {
+        "users": {**USERS_SCHEMA["tables"]["users"], "primary_key": [{"column": "id"}]},
+        "orders": USERS_ORDERS_SCHEMA["tables"]["orders"],
+        "products": {
+            "columns": [{"name": "id", "type": "INT"}],
+            "primary_key": [],
+            "foreign_keys": [],
+        },
+    }
+}
+
+# Shared payloads are serialized once; keyed by id() since the constants
+# live for the whole session
+_PAYLOAD_JSON = {id(payload): json.dumps(payload)
+                 for payload in (CATEGORY_A, EMPTY_SCHEMA, USERS_SCHEMA, USERS_ORDERS_SCHEMA)}
+
+
+def _json_text(data):
+    """Return data as JSON text, reusing the precomputed text for shared payloads."""
+    text = _PAYLOAD_JSON.get(id(data))
+    return text if text is not None else json.dumps(data)
+
+
+@pytest.fixture
+def run_cli(monkeypatch, capsys):
+    """Run a script's main() in-process with the given argv.
+
+    Returns a subprocess.CompletedProcess so assertions read the same as for
+    a spawned interpreter; SystemExit (argparse errors, --help) becomes the
+    return code. input, if given, is served as the script's stdin.
+    """
+    def _run(module, args, input=None):
+        argv = [f"{module.__name__}.py", *args]
+        monkeypatch.setattr(sys, 'argv', argv)
+        if input is not None:
+            monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(input.encode())))
+        capsys.readouterr()
+        try:
+            returncode = module.main()
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else int(e.code is not None)
+        captured = capsys.readouterr()
+        return subprocess.CompletedProcess(argv, returncode or 0, captured.out, captured.err)
+    return _run
 
 
 class TestValidateQueryCLI:
     """Integration tests for validate_query.py CLI."""
 
-    @pytest.fixture
-    def script_path(self):
-        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'validate_query.py'))
-
-    def test_valid_select_returns_0(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--query', 'SELECT * FROM users WHERE id = 1'],
-            capture_output=True,
-            text=True
-        )
+    def test_valid_select_returns_0(self, run_cli):
+        result = run_cli(validate_query, ['--query', 'SELECT * FROM users WHERE id = 1'])
         assert result.returncode == 0
         assert 'Valid: ✓' in result.stdout
 
-    def test_invalid_syntax_returns_1(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--query', "SELECT * FROM users WHERE name = 'test"],
-            capture_output=True,
-            text=True
-        )
+    def test_invalid_syntax_returns_1(self, run_cli):
+        result = run_cli(validate_query, ['--query', "SELECT * FROM users WHERE name = 'test"])
         assert result.returncode == 1
         assert 'Valid: ✗' in result.stdout
         assert 'ERRORS:' in result.stdout
 
-    def test_dangerous_pattern_returns_0_non_strict(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--query', 'SELECT SLEEP(5)'],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 0
-        assert 'WARNINGS:' in result.stdout
-
-    def test_dangerous_pattern_strict_returns_1(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--query', 'SELECT SLEEP(5)', '--strict'],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 1
-        assert 'ERRORS:' in result.stdout
-
-    def test_write_operation_detected(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--query', 'INSERT INTO users VALUES (1)'],
-            capture_output=True,
-            text=True
-        )
+    @pytest.mark.parametrize("extra_args,expected_rc,expected_text", [
+        ([], 0, 'WARNINGS:'),
+        (['--strict'], 1, 'ERRORS:'),
+    ], ids=['non_strict', 'strict'])
+    def test_dangerous_pattern(self, run_cli, extra_args, expected_rc, expected_text):
+        result = run_cli(validate_query, ['--query', 'SELECT SLEEP(5)', *extra_args])
+        assert result.returncode == expected_rc
+        assert expected_text in result.stdout
+
+    def test_write_operation_detected(self, run_cli):
+        result = run_cli(validate_query, ['--query', 'INSERT INTO users VALUES (1)'])
         assert 'Write Operation: Yes' in result.stdout
 
-    def test_query_type_shown(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--query', 'SELECT * FROM users'],
-            capture_output=True,
-            text=True
-        )
+    def test_query_type_shown(self, run_cli):
+        result = run_cli(validate_query, ['--query', 'SELECT * FROM users'])
         assert 'Query Type: SELECT' in result.stdout
 
-    def test_batch_check_flag(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path,
-             '--query', 'DELETE FROM users',
-             '--check-batch', '--estimated-rows', '2000'],
-            capture_output=True,
-            text=True
-        )
+    def test_batch_check_flag(self, run_cli):
+        result = run_cli(validate_query, ['--query', 'DELETE FROM users', '--check-batch', '--estimated-rows', '2000'])
         assert result.returncode == 0
         assert '2000 rows' in result.stdout
 
-    def test_missing_query_argument(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path],
-            capture_output=True,
-            text=True
-        )
+    def test_missing_query_argument(self, run_cli):
+        result = run_cli(validate_query, [])
         assert result.returncode != 0
 
-    def test_help_flag(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--help'],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode == 0
-        assert 'Validate SQL queries' in result.stdout
+
+BATCH_SCENARIOS = [
+    ('SELECT * FROM users WHERE id = 1', 'Valid: ✓'),
+    ("SELECT * FROM users WHERE name = 'test", 'Valid: ✗'),
+    ('SELECT SLEEP(5)', 'WARNINGS:'),
+    ('INSERT INTO users VALUES (1)', 'Write Operation: Yes'),
+    ('SELECT * FROM users', 'Query Type: SELECT'),
+]
+
+
+@pytest.fixture(scope="session")
+def batch_result(tmp_path_factory):
+    """Validate every BATCH_SCENARIOS query in a single interpreter."""
+    batch_file = tmp_path_factory.mktemp("batch") / "queries.sql"
+    batch_file.write_text("\n\n".join(query for query, _ in BATCH_SCENARIOS) + "\n")
+    result = subprocess.run(
+        [*PYCMD, str(SCRIPTS_DIR / 'validate_query.py'), '--batch-file', str(batch_file)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+    blocks = re.split(r'^=== QUERY \d+ ===\n', result.stdout, flags=re.MULTILINE)[1:]
+    return result, blocks
+
+
+class TestValidateQueryBatchCLI:
+    """Integration tests for validate_query.py --batch-file."""
+
+    @pytest.mark.subprocess
+    def test_batch_reports_every_query(self, batch_result):
+        result, blocks = batch_result
+        assert len(blocks) == len(BATCH_SCENARIOS)
+        assert result.returncode == 1
+
+    @pytest.mark.subprocess
+    @pytest.mark.parametrize("index", range(len(BATCH_SCENARIOS)))
+    def test_batch_scenario(self, batch_result, index):
+        _, blocks = batch_result
+        assert BATCH_SCENARIOS[index][1] in blocks[index]
+
+    def test_missing_batch_file_returns_1(self, run_cli):
+        result = run_cli(validate_query, ['--batch-file', '/nonexistent/queries.sql'])
+        assert result.returncode == 1
+        assert 'not found' in result.stdout
+
+    def test_query_and_batch_file_are_exclusive(self, run_cli):
+        result = run_cli(validate_query, ['--query', 'SELECT 1', '--batch-file', 'queries.sql'])
+        assert result.returncode == 2
 
 
 class TestGenerateChartCLI:
     """Integration tests for generate_chart.py CLI."""
 
     @pytest.fixture
-    def script_path(self):
-        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'generate_chart.py'))
-
-    @pytest.fixture
-    def temp_data_file(self):
-        def _create(data):
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                json.dump(data, f)
-                return f.name
-        yield _create
-        for f in ["/tmp/test_chart.json", "/tmp/test_chart.png", "/tmp/test_chart.svg"]:
-            if os.path.exists(f):
-                os.unlink(f)
-
-    def test_missing_data_file_returns_1(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--data-file', '/nonexistent/data.json', '--output', '/tmp/test.png'],
-            capture_output=True,
-            text=True
-        )
+    def run_with_data(self, run_cli):
+        """Run generate_chart.main() in-process with data piped to stdin as JSON."""
+        def _run(args, data):
+            return run_cli(generate_chart, args, input=_json_text(data))
+        return _run
+
+    def test_missing_data_file_returns_1(self, run_cli, tmp_path):
+        result = run_cli(generate_chart, ['--data-file', '/nonexistent/data.json', '--output', str(tmp_path / 'test.png')])
         assert result.returncode == 1
         assert 'not found' in result.stdout
 
-    def test_invalid_json_returns_1(self, script_path):
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            f.write('not valid json')
-            path = f.name
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, '--data-file', path, '--output', '/tmp/test.png'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 1
-            assert 'Invalid JSON' in result.stdout
-        finally:
-            os.unlink(path)
-
-    def test_empty_data_returns_0_no_chart(self, script_path, temp_data_file):
-        data_file = temp_data_file([])
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, '--data-file', data_file, '--output', '/tmp/test.png'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'No data' in result.stdout
-        finally:
-            os.unlink(data_file)
-
-    def test_valid_data_shows_chart_type(self, script_path, temp_data_file):
+    def test_invalid_json_returns_1(self, run_cli, tmp_path):
+        path = tmp_path / 'invalid.json'
+        path.write_text('not valid json')
+        result = run_cli(generate_chart, ['--data-file', str(path), '--output', str(tmp_path / 'test.png')])
+        assert result.returncode == 1
+        assert 'Invalid JSON' in result.stdout
+
+    def test_empty_data_returns_0_no_chart(self, run_with_data, tmp_path):
+        result = run_with_data(['--data-file', '-', '--output', str(tmp_path / 'test.png')], [])
+        assert result.returncode == 0
+        assert 'No data' in result.stdout
+
+    def test_valid_data_shows_chart_type(self, run_with_data, tmp_path):
         data = [{"category": "A", "value": 10}, {"category": "B", "value": 20}]
-        data_file = temp_data_file(data)
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, '--data-file', data_file, '--output', '/tmp/test.png'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'Chart type:' in result.stdout
-        finally:
-            os.unlink(data_file)
-
-    def test_explicit_chart_type(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, '--data-file', data_file, '--output', '/tmp/test.png', '--type', 'bar'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'Chart type: bar' in result.stdout
-        finally:
-            os.unlink(data_file)
-
-    def test_save_as_json_format(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_spec.json'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, '--data-file', data_file, '--output', output_path, '--format', 'json'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'Vega spec saved' in result.stdout
-            assert os.path.exists(output_path)
-            with open(output_path, 'r') as f:
-                spec = json.load(f)
-            assert '$schema' in spec
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_help_flag(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--help'],
-            capture_output=True,
-            text=True
-        )
+        result = run_with_data(['--data-file', '-', '--output', str(tmp_path / 'test.png')], data)
         assert result.returncode == 0
-        assert 'Generate charts' in result.stdout
+        assert 'Chart type:' in result.stdout
 
-    def test_custom_width_height(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_spec.json'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path,
-                 '--width', '600',
-                 '--height', '300'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_auto_chart_type_detection(self, script_path, temp_data_file):
-        data = [{"date": "2024-01-01", "value": 100}, {"date": "2024-02-01", "value": 150}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_auto.png'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path,
-                 '--type', 'auto'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'Chart type: line' in result.stdout
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_title_from_filename(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/my_test_chart.png'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_invalid_chart_type(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_invalid.png'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path,
-                 '--type', 'invalid_type'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 2
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_svg_format_output(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_chart.svg'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path,
-                 '--format', 'svg'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_custom_title_argument(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_custom_title.png'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path,
-                 '--title', 'My Custom Chart Title'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_output_to_subdirectory(self, script_path, temp_data_file):
-        data = [{"category": "A", "value": 10}]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_subdir_output/chart.json'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path,
-                 '--format', 'json'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert os.path.exists(output_path), f"Expected {output_path} to exist. stdout: {result.stdout}, stderr: {result.stderr}"
-        finally:
-            os.unlink(data_file)
-            if os.path.exists('/tmp/test_subdir_output'):
-                import shutil
-                shutil.rmtree('/tmp/test_subdir_output')
-
-    def test_pie_chart_detection(self, script_path, temp_data_file):
-        data = [
-            {"category": "A", "value": 10},
-            {"category": "B", "value": 20},
-            {"category": "C", "value": 15},
-        ]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_pie.png'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'Chart type: pie' in result.stdout
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_scatter_chart_detection(self, script_path, temp_data_file):
-        data = [
-            {"x": 1, "y": 10},
-            {"x": 2, "y": 20},
-            {"x": 3, "y": 30},
-        ]
-        data_file = temp_data_file(data)
-        output_path = '/tmp/test_scatter.png'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path,
-                 '--data-file', data_file,
-                 '--output', output_path],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'Chart type: scatter' in result.stdout
-        finally:
-            os.unlink(data_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
+    def test_explicit_chart_type(self, run_with_data, tmp_path):
+        result = run_with_data(['--data-file', '-', '--output', str(tmp_path / 'test.png'), '--type', 'bar'], CATEGORY_A)
+        assert result.returncode == 0
+        assert 'Chart type: bar' in result.stdout
+
+    def test_save_as_json_format(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_spec.json')
+        result = run_with_data(['--data-file', '-', '--output', output_path, '--format', 'json'], CATEGORY_A)
+        assert result.returncode == 0
+        assert 'Vega spec saved' in result.stdout
+        assert os.path.exists(output_path)
+
+    def test_json_spec_to_stdout(self, run_with_data):
+        result = run_with_data(['--data-file', '-', '--output', '-', '--format', 'json'], CATEGORY_A)
+        assert result.returncode == 0
+        spec = json.loads(result.stdout)
+        assert '$schema' in spec
+        assert 'Chart type: pie' in result.stderr
+
+    def test_stdout_output_requires_json_format(self, run_with_data):
+        result = run_with_data(['--data-file', '-', '--output', '-', '--format', 'png'], CATEGORY_A)
+        assert result.returncode == 1
+        assert result.stdout == ''
+        assert 'requires --format json' in result.stderr
+
+    def test_custom_width_height(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_spec.json')
+        result = run_with_data(['--data-file', '-', '--output', output_path, '--width', '600', '--height', '300'], CATEGORY_A)
+        assert result.returncode == 0
+
+    def test_title_from_filename(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'my_test_chart.png')
+        result = run_with_data(['--data-file', '-', '--output', output_path], CATEGORY_A)
+        assert result.returncode == 0
+
+    def test_invalid_chart_type(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_invalid.png')
+        result = run_with_data(['--data-file', '-', '--output', output_path, '--type', 'invalid_type'], CATEGORY_A)
+        assert result.returncode == 2
+
+    def test_svg_format_output(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_chart.svg')
+        result = run_with_data(['--data-file', '-', '--output', output_path, '--format', 'svg'], CATEGORY_A)
+        assert result.returncode == 0
+
+    def test_custom_title_argument(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_custom_title.png')
+        result = run_with_data(['--data-file', '-', '--output', output_path, '--title', 'My Custom Chart Title'], CATEGORY_A)
+        assert result.returncode == 0
+
+    def test_output_to_subdirectory(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_subdir_output' / 'chart.json')
+        result = run_with_data(['--data-file', '-', '--output', output_path, '--format', 'json'], CATEGORY_A)
+        assert result.returncode == 0
+        assert os.path.exists(output_path), f"Expected {output_path} to exist. stdout: {result.stdout}, stderr: {result.stderr}"
+
+    @pytest.mark.parametrize("data,expected_type", [
+        ([{"date": "2024-01-01", "value": 100}, {"date": "2024-02-01", "value": 150}], 'line'),
+        ([{"category": c, "value": v} for c, v in zip("ABC", (10, 20, 15))], 'pie'),
+        ([{"x": x, "y": x * 10} for x in range(1, 4)], 'scatter'),
+        ([{"category": c, "value": 10} for c in "ABCDEFG"], 'bar'),
+    ], ids=['line', 'pie', 'scatter', 'bar'])
+    def test_auto_chart_type_detection(self, run_with_data, tmp_path, data, expected_type):
+        output_path = str(tmp_path / 'test_auto.png')
+        result = run_with_data(['--data-file', '-', '--output', output_path, '--type', 'auto'], data)
+        assert result.returncode == 0
+        assert f'Chart type: {expected_type}' in result.stdout
+
+
+@pytest.fixture(scope="session")
+def rich_schema_file(shared_json_file):
+    """RICH_SCHEMA written once per session for the diagram tests to share."""
+    return shared_json_file(RICH_SCHEMA)
 
 
 class TestGenerateMermaidCLI:
     """Integration tests for generate_mermaid.py CLI."""
 
-    @pytest.fixture
-    def script_path(self):
-        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'generate_mermaid.py'))
+    @pytest.fixture(autouse=True)
+    def opened_urls(self, monkeypatch):
+        """Record browser opens instead of launching a browser from the test process."""
+        urls = []
+        monkeypatch.setattr(generate_mermaid.webbrowser, 'open', urls.append)
+        yield urls
+        for thread in threading.enumerate():
+            if thread.name == generate_mermaid.BROWSER_THREAD_NAME:
+                thread.join()
 
     @pytest.fixture
-    def temp_schema_file(self):
-        def _create(schema):
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                json.dump(schema, f)
-                return f.name
-        return _create
-
-    def test_missing_schema_file_returns_1(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, 'erd', '--schema-file', '/nonexistent/schema.json', '--output', '/tmp/test.mmd'],
-            capture_output=True,
-            text=True
-        )
+    def run_with_data(self, run_cli):
+        """Run generate_mermaid.main() in-process with data piped to stdin as JSON."""
+        def _run(args, data):
+            return run_cli(generate_mermaid, args, input=_json_text(data))
+        return _run
+
+    def test_missing_schema_file_returns_1(self, run_cli, tmp_path):
+        result = run_cli(generate_mermaid, ['erd', '--schema-file', '/nonexistent/schema.json', '--output', str(tmp_path / 'test.mmd')])
         assert result.returncode == 1
         assert 'not found' in result.stdout
 
-    def test_invalid_json_returns_1(self, script_path):
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            f.write('not valid json')
-            path = f.name
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'erd', '--schema-file', path, '--output', '/tmp/test.mmd'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 1
-            assert 'Invalid JSON' in result.stdout
-        finally:
-            os.unlink(path)
-
-    def test_erd_type_generates_diagram(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_erd.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'erd', '--schema-file', schema_file, '--output', output_path, '--no-open'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'Generated:' in result.stdout
-            assert os.path.exists(output_path)
-            with open(output_path, 'r') as f:
-                content = f.read()
-            assert 'erDiagram' in content
-            assert 'USERS' in content
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_schema_type_alias(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_schema.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'schema', '--schema-file', schema_file, '--output', output_path, '--no-open'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_lineage_type(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_lineage.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'lineage', '--schema-file', schema_file, '--output', output_path, '--no-open'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert os.path.exists(output_path)
-            with open(output_path, 'r') as f:
-                content = f.read()
-            assert 'graph LR' in content
-            assert 'USERS' in content
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_query_plan_type_requires_plan_file(self, script_path, temp_schema_file):
-        schema_file = temp_schema_file({"tables": {}})
-        result = subprocess.run(
-            [sys.executable, script_path, 'query-plan', '--schema-file', schema_file, '--output', '/tmp/test.mmd'],
-            capture_output=True,
-            text=True
-        )
-        os.unlink(schema_file)
+    def test_invalid_json_returns_1(self, run_cli, tmp_path):
+        path = tmp_path / 'invalid.json'
+        path.write_text('not valid json')
+        result = run_cli(generate_mermaid, ['erd', '--schema-file', str(path), '--output', str(tmp_path / 'test.mmd')])
+        assert result.returncode == 1
+        assert 'Invalid JSON' in result.stdout
+
+    def test_query_plan_type_requires_plan_file(self, run_with_data, tmp_path):
+        result = run_with_data(['query-plan', '--schema-file', '-', '--output', str(tmp_path / 'test.mmd')], EMPTY_SCHEMA)
         assert result.returncode == 1
         assert '--query-plan-file required' in result.stdout
 
-    def test_query_plan_type(self, script_path):
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as schema_f:
-            json.dump({"tables": {}}, schema_f)
-            schema_path = schema_f.name
+    def test_query_plan_type(self, run_cli, tmp_path):
+        schema_path = tmp_path / 'schema.json'
+        schema_path.write_text(_json_text(EMPTY_SCHEMA))
 
         plan_data = {
             "type": "Seq Scan",
             "details": "on users",
             "children": [],
         }
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as plan_f:
-            json.dump(plan_data, plan_f)
-            plan_path = plan_f.name
+        plan_path = tmp_path / 'plan.json'
+        plan_path.write_text(json.dumps(plan_data))
 
-        output_path = '/tmp/test_query_plan.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'query-plan',
-                 '--schema-file', schema_path,
-                 '--query-plan-file', plan_path,
-                 '--output', output_path,
-                 '--no-open'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert os.path.exists(output_path)
-            with open(output_path, 'r') as f:
-                content = f.read()
-            assert 'graph TD' in content
-            assert 'Seq Scan' in content
-        finally:
-            os.unlink(schema_path)
-            os.unlink(plan_path)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_tables_filter(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                },
-                "products": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_filtered.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'erd',
-                 '--schema-file', schema_file,
-                 '--output', output_path,
-                 '--tables', 'users,orders',
-                 '--no-open'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            with open(output_path, 'r') as f:
-                content = f.read()
-            assert 'USERS' in content
-            assert 'ORDERS' in content
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_help_flag(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, '--help'],
-            capture_output=True,
-            text=True
-        )
+        output_path = str(tmp_path / 'test_query_plan.mmd')
+        result = run_cli(generate_mermaid, ['query-plan', '--schema-file', str(schema_path), '--query-plan-file', str(plan_path), '--output', output_path, '--no-open'])
+        assert result.returncode == 0
+        assert os.path.exists(output_path)
+        with open(output_path, 'r') as f:
+            content = f.read()
+        assert 'graph TD' in content
+        assert 'Seq Scan' in content
+
+    @pytest.mark.parametrize("subcmd,extra_args,expected_content,expected_stdout", [
+        ('erd', ['--no-open'], 'erDiagram', 'Generated:'),
+        ('schema', ['--no-open'], 'erDiagram', 'Generated:'),
+        ('lineage', ['--no-open'], 'graph LR', 'Generated:'),
+        ('erd', [], 'erDiagram', 'mermaid.live'),
+        ('lineage', [], 'graph LR', 'mermaid.live'),
+    ], ids=['erd', 'schema', 'lineage', 'erd_browser', 'lineage_browser'])
+    def test_diagram_types(self, run_cli, rich_schema_file, tmp_path,
+                           subcmd, extra_args, expected_content, expected_stdout):
+        output_path = tmp_path / 'diagram.mmd'
+        result = run_cli(generate_mermaid, [subcmd, '--schema-file', rich_schema_file,
+                                            '--output', str(output_path), *extra_args])
         assert result.returncode == 0
-        assert 'Generate Mermaid' in result.stdout
-
-    def test_unknown_type_returns_error(self, script_path):
-        result = subprocess.run(
-            [sys.executable, script_path, 'unknown_type', '--schema-file', '/tmp/fake.json', '--output', '/tmp/test.mmd'],
-            capture_output=True,
-            text=True
-        )
+        assert expected_stdout in result.stdout
+        content = output_path.read_text()
+        assert expected_content in content
+        assert 'USERS' in content
+
+    def test_tables_filter(self, run_cli, rich_schema_file, tmp_path):
+        output_path = tmp_path / 'test_filtered.mmd'
+        result = run_cli(generate_mermaid, ['erd', '--schema-file', rich_schema_file, '--output', str(output_path),
+                                            '--tables', 'users,orders', '--no-open'])
+        assert result.returncode == 0
+        content = output_path.read_text()
+        assert 'USERS' in content
+        assert 'ORDERS' in content
+        assert 'PRODUCTS' not in content
+
+    def test_unknown_type_returns_error(self, run_cli, tmp_path):
+        result = run_cli(generate_mermaid, ['unknown_type', '--schema-file', str(tmp_path / 'fake.json'), '--output', str(tmp_path / 'test.mmd')])
         assert result.returncode != 0
 
-    def test_lineage_with_specific_table(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_lineage_table.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'lineage',
-                 '--schema-file', schema_file,
-                 '--output', output_path,
-                 '--table', 'users',
-                 '--no-open'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_erd_with_invalid_tables_filter(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_erd_filter.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'erd',
-                 '--schema-file', schema_file,
-                 '--output', output_path,
-                 '--tables', 'nonexistent',
-                 '--no-open'],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_query_plan_file_not_found(self, script_path, temp_schema_file):
-        schema_file = temp_schema_file({"tables": {}})
-        result = subprocess.run(
-            [sys.executable, script_path, 'query-plan',
-             '--schema-file', schema_file,
-             '--query-plan-file', '/nonexistent/plan.json',
-             '--output', '/tmp/test.mmd',
-             '--no-open'],
-            capture_output=True,
-            text=True
-        )
-        os.unlink(schema_file)
+    def test_lineage_with_specific_table(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_lineage_table.mmd')
+        result = run_with_data(['lineage', '--schema-file', '-', '--output', output_path, '--table', 'users', '--no-open'], USERS_ORDERS_SCHEMA)
+        assert result.returncode == 0
+
+    def test_erd_with_invalid_tables_filter(self, run_with_data, tmp_path):
+        output_path = str(tmp_path / 'test_erd_filter.mmd')
+        result = run_with_data(['erd', '--schema-file', '-', '--output', output_path, '--tables', 'nonexistent', '--no-open'], USERS_SCHEMA)
+        assert result.returncode == 0
+
+    def test_query_plan_file_not_found(self, run_with_data, tmp_path):
+        result = run_with_data(['query-plan', '--schema-file', '-', '--query-plan-file', '/nonexistent/plan.json', '--output', str(tmp_path / 'test.mmd'), '--no-open'], EMPTY_SCHEMA)
         assert result.returncode == 1
         assert 'Query plan file not found' in result.stdout
 
-    def test_erd_opens_browser(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_browser.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'erd',
-                 '--schema-file', schema_file,
-                 '--output', output_path],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'mermaid.live' in result.stdout
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-
-    def test_lineage_opens_browser(self, script_path, temp_schema_file):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        output_path = '/tmp/test_lineage_browser.mmd'
-        try:
-            result = subprocess.run(
-                [sys.executable, script_path, 'lineage',
-                 '--schema-file', schema_file,
-                 '--output', output_path],
-                capture_output=True,
-                text=True
-            )
-            assert result.returncode == 0
-            assert 'mermaid.live' in result.stdout
-        finally:
-            os.unlink(schema_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
+
+HELP_TEXT = {
+    'validate_query.py': 'Validate SQL queries',
+    'generate_chart.py': 'Generate charts',
+    'generate_mermaid.py': 'Generate Mermaid',
+}
 
 
 class TestAllScriptsSmokeTests:
     """Smoke tests to ensure scripts are runnable."""
 
-    def test_validate_query_runs(self):
-        result = subprocess.run(
-            [sys.executable, 'scripts/validate_query.py', '--query', 'SELECT 1'],
-            capture_output=True,
-            text=True,
-            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        )
-        assert result.returncode in [0, 1]
-
-    def test_generate_chart_runs(self):
-        result = subprocess.run(
-            [sys.executable, 'scripts/generate_chart.py', '--help'],
-            capture_output=True,
-            text=True,
-            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        )
-        assert result.returncode == 0
-
-    def test_generate_mermaid_runs(self):
-        result = subprocess.run(
-            [sys.executable, 'scripts/generate_mermaid.py', '--help'],
-            capture_output=True,
-            text=True,
-            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        )
-        assert result.returncode == 0
\ No newline at end of file
+    @pytest.mark.subprocess
+    def test_all_scripts_show_help(self):
+        """Spawn every script's --help concurrently; the cost is process startup, not the GIL."""
+        workers = min(len(HELP_TEXT), max(1, (os.cpu_count() or 1) - 2))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = dict(zip(HELP_TEXT, pool.map(
+                lambda script: subprocess.run(
+                    [*PYCMD, str(SCRIPTS_DIR / script), '--help'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True
+                ),
+                HELP_TEXT,
+            )))
+        for script, result in results.items():
+            assert result.returncode == 0, script
+            assert HELP_TEXT[script] in result.stdout, script
@@ -3,148 +3,137 @@ Unit tests for generate_chart.py - Chart generation and Vega-Lite spec building.
 """
 
 import pytest
+import base64
+import gzip
+import io
 import json
 import sys
 import os
 import tempfile
+from types import MappingProxyType
 from unittest.mock import patch, MagicMock
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
-
+import generate_chart
 from generate_chart import (
+    main as chart_main,
     detect_chart_type,
     build_vega_spec,
     save_vega_spec,
     render_with_altair,
+    render_with_vl_convert,
+    render_chart,
+    load_json,
+    resolve_data_mode,
+    EXTERNAL_DATA_THRESHOLD,
+    _OPTIONAL_MODULES,
+    _optional_import,
 )
 
 
+@pytest.fixture(autouse=True)
+def clear_optional_modules():
+    """Forget lazily imported optional modules so sys.modules patches apply."""
+    _OPTIONAL_MODULES.clear()
+    yield
+    _OPTIONAL_MODULES.clear()
+
+
+@pytest.fixture(scope="class")
+def altair_modules():
+    """Mock altair and pandas in sys.modules once per test class."""
+    mock_altair = MagicMock()
+    mock_pd = MagicMock()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setitem(sys.modules, 'altair', mock_altair)
+        mp.setitem(sys.modules, 'pandas', mock_pd)
+        yield mock_altair, mock_pd
+
+
+@pytest.fixture
+def altair_mocks(altair_modules):
+    """Share the class mocks, resetting recorded calls and side effects after each test."""
+    yield altair_modules
+    for mock in altair_modules:
+        mock.reset_mock(side_effect=True)
+
+
 class TestDetectChartType:
     """Test detect_chart_type function."""
 
-    def test_empty_data_returns_bar(self):
-        result = detect_chart_type([])
-        assert result == "bar"
-
-    def test_none_data_returns_bar(self):
-        result = detect_chart_type(None)
-        assert result == "bar"
-
-    def test_temporal_with_numeric_returns_line(self):
-        data = [
-            {"date": "2024-01-01", "value": 100},
-            {"date": "2024-02-01", "value": 150},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
-
-    def test_time_column_returns_line(self):
-        data = [
-            {"time": "08:00", "count": 50},
-            {"time": "09:00", "count": 75},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
-
-    def test_day_column_returns_line(self):
-        data = [
-            {"day": "Monday", "sales": 100},
-            {"day": "Tuesday", "sales": 150},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
-
-    def test_year_column_returns_line(self):
-        data = [
-            {"year": 2023, "value": 1000},
-            {"year": 2024, "value": 1500},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
-
-    def test_two_numeric_columns_returns_scatter(self):
-        data = [
-            {"x": 10, "y": 100},
-            {"x": 20, "y": 200},
-            {"x": 30, "y": 300},
-        ]
-        result = detect_chart_type(data)
-        assert result == "scatter"
-
-    def test_single_numeric_column_returns_pie(self):
-        data = [
-            {"category": "A", "value": 10},
-            {"category": "B", "value": 20},
-        ]
-        result = detect_chart_type(data)
-        assert result == "pie"
-
-    def test_small_dataset_returns_pie(self):
-        data = [
-            {"category": "A", "value": 10},
-            {"category": "B", "value": 20},
-            {"category": "C", "value": 15},
-            {"category": "D", "value": 25},
-            {"category": "E", "value": 30},
-        ]
-        result = detect_chart_type(data)
-        assert result == "pie"
-
-    def test_six_items_returns_pie(self):
-        data = [
-            {"category": "A", "value": 10},
-            {"category": "B", "value": 20},
-            {"category": "C", "value": 15},
-            {"category": "D", "value": 25},
-            {"category": "E", "value": 30},
-            {"category": "F", "value": 35},
-        ]
-        result = detect_chart_type(data)
-        assert result == "pie"
-
-    def test_temporal_and_numeric_two_returns_line(self):
-        data = [
-            {"date": "2024-01-01", "x": 10, "y": 100},
-            {"date": "2024-02-01", "x": 20, "y": 200},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
-
-    def test_no_temporal_two_numeric_returns_scatter(self):
-        data = [
-            {"label": "A", "num1": 10, "num2": 100},
-            {"label": "B", "num1": 20, "num2": 200},
-        ]
-        result = detect_chart_type(data)
-        assert result == "scatter"
-
-    def test_string_values_not_numeric(self):
-        data = [
-            {"category": "A", "value": "10"},
-            {"category": "B", "value": "20"},
-        ]
-        result = detect_chart_type(data)
-        assert result == "pie"
-
-    def test_mixed_types_first_not_numeric(self):
-        data = [
-            {"label": "A", "value": 10},
-            {"label": "B", "value": 20},
-        ]
-        result = detect_chart_type(data)
-        assert result == "pie"
-
-    def test_date_datetime_detection(self):
-        data = [
-            {"timestamp": "2024-01-01T10:00:00", "count": 100},
-            {"timestamp": "2024-01-02T10:00:00", "count": 150},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
+    @pytest.mark.parametrize("data,expected", [
+        pytest.param([], "bar", id="empty_bar"),
+        pytest.param(None, "bar", id="none_bar"),
+        pytest.param([{"date": "2024-01-01", "value": 100}, {"date": "2024-02-01", "value": 150}],
+                     "line", id="temporal_numeric_line"),
+        pytest.param([{"time": "08:00", "count": 50}, {"time": "09:00", "count": 75}],
+                     "line", id="time_column_line"),
+        pytest.param([{"day": "Monday", "sales": 100}, {"day": "Tuesday", "sales": 150}],
+                     "line", id="day_column_line"),
+        pytest.param([{"year": 2023, "value": 1000}, {"year": 2024, "value": 1500}],
+                     "line", id="year_column_line"),
+        pytest.param([{"x": 10, "y": 100}, {"x": 20, "y": 200}, {"x": 30, "y": 300}],
+                     "scatter", id="two_numeric_scatter"),
+        pytest.param([{"category": "A", "value": 10}, {"category": "B", "value": 20}],
+                     "pie", id="single_numeric_pie"),
+        pytest.param([{"category": c, "value": 10} for c in "ABCDE"], "pie", id="small_dataset_pie"),
+        pytest.param([{"category": c, "value": 10} for c in "ABCDEF"], "pie", id="six_items_pie"),
+        pytest.param([{"date": "2024-01-01", "x": 10, "y": 100}, {"date": "2024-02-01", "x": 20, "y": 200}],
+                     "line", id="temporal_two_numeric_line"),
+        pytest.param([{"label": "A", "num1": 10, "num2": 100}, {"label": "B", "num1": 20, "num2": 200}],
+                     "scatter", id="no_temporal_two_numeric_scatter"),
+        pytest.param([{"category": "A", "value": "10"}, {"category": "B", "value": "20"}],
+                     "pie", id="string_values_not_numeric"),
+        pytest.param([{"label": "A", "value": 10}, {"label": "B", "value": 20}],
+                     "pie", id="first_column_not_numeric"),
+        pytest.param([{"timestamp": "2024-01-01T10:00:00", "count": 100},
+                      {"timestamp": "2024-01-02T10:00:00", "count": 150}],
+                     "line", id="timestamp_line"),
+        pytest.param([{"category": "A", "value": 10}], "pie", id="single_item_pie"),
+        pytest.param([{"name": "A", "label": "X"}, {"name": "B", "label": "Y"}],
+                     "pie", id="all_string_columns_pie"),
+        pytest.param([{"DATE": "2024-01-01", "value": 100}, {"DATE": "2024-02-01", "value": 150}],
+                     "line", id="column_name_case_insensitive"),
+        pytest.param([{"timestamp": "2024-01-01T10:00:00Z", "count": 100},
+                      {"timestamp": "2024-01-02T10:00:00Z", "count": 150}],
+                     "line", id="timestamp_utc_line"),
+    ])
+    def test_detect(self, data, expected):
+        assert detect_chart_type(data) == expected
+
+
+CATEGORY_DATA = [{"category": "A", "value": 10}]
+
+
+@pytest.fixture(scope="module")
+def bar_spec():
+    return build_vega_spec(CATEGORY_DATA, "bar", "My Chart", 600, 300)
+
+
+@pytest.fixture(scope="module")
+def line_spec():
+    return build_vega_spec([{"date": "2024-01-01", "value": 100}], "line", "Test", 800, 400)
+
+
+@pytest.fixture(scope="module")
+def pie_spec():
+    return build_vega_spec(CATEGORY_DATA, "pie", "Test", 800, 400)
+
+
+@pytest.fixture(scope="module")
+def scatter_spec():
+    return build_vega_spec([{"x": 10, "y": 100, "label": "A"}], "scatter", "Test", 800, 400)
+
+
+@pytest.fixture(scope="module")
+def area_spec():
+    return build_vega_spec([{"timestamp": "2024-01-01T10:00:00", "value": 100}], "area", "Test", 800, 400)
 
 
 class TestBuildVegaSpec:
-    """Test build_vega_spec function."""
+    """Test build_vega_spec function.
+
+    The *_spec fixtures are built once per module, so tests must only read them.
+    """
 
     def test_empty_data_returns_empty_dict(self):
         result = build_vega_spec([], "bar", "Test", 800, 400)
@@ -154,91 +143,60 @@ class TestBuildVegaSpec:
         result = build_vega_spec(None, "bar", "Test", 800, 400)
         assert result == {}
 
-    def test_bar_chart_has_correct_schema(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "bar", "Test Chart", 800, 400)
-        assert result["$schema"] == "https://vega.github.io/schema/vega-lite/v5.json"
+    def test_bar_chart_has_correct_schema(self, bar_spec):
+        assert bar_spec["$schema"] == "https://vega.github.io/schema/vega-lite/v5.json"
 
-    def test_bar_chart_has_correct_title(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "bar", "My Chart", 800, 400)
-        assert result["title"] == "My Chart"
+    def test_bar_chart_has_correct_title(self, bar_spec):
+        assert bar_spec["title"] == "My Chart"
 
-    def test_bar_chart_has_correct_dimensions(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "bar", "Test", 600, 300)
-        assert result["width"] == 600
-        assert result["height"] == 300
+    def test_bar_chart_has_correct_dimensions(self, bar_spec):
+        assert bar_spec["width"] == 600
+        assert bar_spec["height"] == 300
 
-    def test_bar_chart_has_bar_mark(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "bar", "Test", 800, 400)
-        assert result["mark"]["type"] == "bar"
+    @pytest.mark.parametrize("chart_type,data,expected_mark", [
+        pytest.param("bar", [{"category": "A", "value": 10}], "bar", id="bar"),
+        pytest.param("line", [{"date": "2024-01-01", "value": 100}], "line", id="line"),
+        pytest.param("pie", [{"category": "A", "value": 10}], "arc", id="pie"),
+        pytest.param("scatter", [{"x": 10, "y": 100}], "point", id="scatter"),
+        pytest.param("area", [{"date": "2024-01-01", "value": 100}], "area", id="area"),
+    ])
+    def test_mark_type(self, chart_type, data, expected_mark):
+        mark = build_vega_spec(data, chart_type, "Test", 800, 400)["mark"]
+        assert (mark["type"] if isinstance(mark, dict) else mark) == expected_mark
 
-    def test_bar_chart_has_encoding(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "bar", "Test", 800, 400)
-        assert "encoding" in result
-        assert "x" in result["encoding"]
-        assert "y" in result["encoding"]
+    def test_bar_chart_has_encoding(self, bar_spec):
+        assert "encoding" in bar_spec
+        assert "x" in bar_spec["encoding"]
+        assert "y" in bar_spec["encoding"]
 
-    def test_line_chart_has_line_mark(self):
-        data = [{"date": "2024-01-01", "value": 100}]
-        result = build_vega_spec(data, "line", "Test", 800, 400)
-        assert result["mark"]["type"] == "line"
-
-    def test_line_chart_has_temporal_x_for_date(self):
-        data = [{"date": "2024-01-01", "value": 100}]
-        result = build_vega_spec(data, "line", "Test", 800, 400)
-        assert result["encoding"]["x"]["type"] == "temporal"
+    def test_line_chart_has_temporal_x_for_date(self, line_spec):
+        assert line_spec["encoding"]["x"]["type"] == "temporal"
 
     def test_line_chart_has_ordinal_x_for_non_date(self):
         data = [{"category": "A", "value": 100}]
         result = build_vega_spec(data, "line", "Test", 800, 400)
         assert result["encoding"]["x"]["type"] == "ordinal"
 
-    def test_line_chart_has_point(self):
-        data = [{"date": "2024-01-01", "value": 100}]
-        result = build_vega_spec(data, "line", "Test", 800, 400)
-        assert result["mark"]["point"] is True
-
-    def test_line_chart_has_interpolate(self):
-        data = [{"date": "2024-01-01", "value": 100}]
-        result = build_vega_spec(data, "line", "Test", 800, 400)
-        assert result["mark"]["interpolate"] == "monotone"
-
-    def test_pie_chart_has_arc_mark(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "pie", "Test", 800, 400)
-        assert result["mark"]["type"] == "arc"
+    def test_line_chart_has_point(self, line_spec):
+        assert line_spec["mark"]["point"] is True
 
-    def test_pie_chart_has_inner_radius(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "pie", "Test", 800, 400)
-        assert result["mark"]["innerRadius"] == 50
+    def test_line_chart_has_interpolate(self, line_spec):
+        assert line_spec["mark"]["interpolate"] == "monotone"
 
-    def test_pie_chart_has_theta_encoding(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "pie", "Test", 800, 400)
-        assert "theta" in result["encoding"]
-        assert result["encoding"]["theta"]["type"] == "quantitative"
+    def test_pie_chart_has_inner_radius(self, pie_spec):
+        assert pie_spec["mark"]["innerRadius"] == 50
 
-    def test_pie_chart_has_color_encoding(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "pie", "Test", 800, 400)
-        assert "color" in result["encoding"]
-        assert result["encoding"]["color"]["type"] == "nominal"
+    def test_pie_chart_has_theta_encoding(self, pie_spec):
+        assert "theta" in pie_spec["encoding"]
+        assert pie_spec["encoding"]["theta"]["type"] == "quantitative"
 
-    def test_scatter_chart_has_point_mark(self):
-        data = [{"x": 10, "y": 100}]
-        result = build_vega_spec(data, "scatter", "Test", 800, 400)
-        assert result["mark"] == "point"
+    def test_pie_chart_has_color_encoding(self, pie_spec):
+        assert "color" in pie_spec["encoding"]
+        assert pie_spec["encoding"]["color"]["type"] == "nominal"
 
-    def test_scatter_uses_numeric_columns(self):
-        data = [{"x": 10, "y": 100, "label": "A"}]
-        result = build_vega_spec(data, "scatter", "Test", 800, 400)
-        assert result["encoding"]["x"]["field"] == "x"
-        assert result["encoding"]["y"]["field"] == "y"
+    def test_scatter_uses_numeric_columns(self, scatter_spec):
+        assert scatter_spec["encoding"]["x"]["field"] == "x"
+        assert scatter_spec["encoding"]["y"]["field"] == "y"
 
     def test_scatter_fallback_to_first_two_columns(self):
         data = [{"label": "A", "category": "B"}]
@@ -246,307 +204,439 @@ class TestBuildVegaSpec:
         assert result["encoding"]["x"]["field"] == "label"
         assert result["encoding"]["y"]["field"] == "category"
 
-    def test_area_chart_has_area_mark(self):
-        data = [{"date": "2024-01-01", "value": 100}]
-        result = build_vega_spec(data, "area", "Test", 800, 400)
-        assert result["mark"] == "area"
+    def test_area_chart_temporal_x(self, area_spec):
+        assert area_spec["encoding"]["x"]["type"] == "temporal"
 
-    def test_area_chart_temporal_x(self):
-        data = [{"timestamp": "2024-01-01T10:00:00", "value": 100}]
-        result = build_vega_spec(data, "area", "Test", 800, 400)
-        assert result["encoding"]["x"]["type"] == "temporal"
+    # Area specs carry no tooltip encoding
+    @pytest.mark.parametrize("chart_type", ["bar", "line", "pie", "scatter"])
+    def test_chart_type_has_tooltip(self, chart_type):
+        result = build_vega_spec([{"x": 10, "y": 100}], chart_type, "Test", 800, 400)
+        assert "tooltip" in result["encoding"]
 
-    def test_all_chart_types_have_tooltip(self):
-        chart_types = ["bar", "line", "pie", "scatter", "area"]
-        data = [{"x": 10, "y": 100}]
+    def test_data_values_are_in_spec(self, bar_spec):
+        assert bar_spec["data"]["values"] == CATEGORY_DATA
 
-        for chart_type in chart_types:
-            result = build_vega_spec(data, chart_type, "Test", 800, 400)
-            if chart_type != "area":
-                assert "tooltip" in result["encoding"], f"Missing tooltip for {chart_type}"
 
-    def test_data_values_are_in_spec(self):
-        data = [{"category": "A", "value": 10}]
-        result = build_vega_spec(data, "bar", "Test", 800, 400)
-        assert result["data"]["values"] == data
+# Read-only so tests can share it; build variants with {**_BASE_SPEC, ...}
+_BASE_SPEC = MappingProxyType({
+    "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+    "data": {"values": [{"x": 10, "y": 100}]},
+    "mark": "point",
+    "encoding": {
+        "x": {"field": "x", "type": "quantitative"},
+        "y": {"field": "y", "type": "quantitative"},
+    },
+})
 
 
-class TestRenderWithAltair:
-    """Test render_with_altair function."""
+def test_render_with_altair_import_error_returns_false(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'altair', None)
+    monkeypatch.setitem(sys.modules, 'pandas', None)
+    result = render_with_altair({**_BASE_SPEC}, "/tmp/test.png")
+    assert result is False
 
-    def test_import_error_returns_false(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"x": 10, "y": 100}]},
-            "mark": "point",
-            "encoding": {
-                "x": {"field": "x", "type": "quantitative"},
-                "y": {"field": "y", "type": "quantitative"},
-            },
-        }
 
-        with patch.dict('sys.modules', {'altair': None, 'pandas': None}):
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is False
-
-    def test_valid_spec_returns_true(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"x": 10, "y": 100}]},
-            "mark": "point",
-            "encoding": {
-                "x": {"field": "x", "type": "quantitative"},
-                "y": {"field": "y", "type": "quantitative"},
-            },
-        }
-
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
-
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            mock_chart = MagicMock()
-            mock_altair.Chart.return_value.encode.return_value = mock_chart
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is True
-
-    def test_svg_format(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"x": 10, "y": 100}]},
-            "mark": "point",
-            "encoding": {
-                "x": {"field": "x", "type": "quantitative"},
-                "y": {"field": "y", "type": "quantitative"},
-            },
-        }
+def test_render_with_real_altair(tmp_path):
+    pytest.importorskip('altair')
+    output = tmp_path / "chart.html"
+    assert render_with_altair({**_BASE_SPEC}, str(output)) is True
+    assert output.stat().st_size > 0
 
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
 
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            result = render_with_altair(spec, "/tmp/test.svg", format='svg')
-            assert result is True
+class TestRenderWithAltair:
+    """Test render_with_altair function."""
 
-    def test_render_with_color_encoding(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"x": 10, "y": 100, "category": "A"}]},
-            "mark": "point",
-            "encoding": {
-                "x": {"field": "x", "type": "quantitative"},
-                "y": {"field": "y", "type": "quantitative"},
+    def test_valid_spec_returns_true(self, altair_mocks):
+        mock_altair, _ = altair_mocks
+        result = render_with_altair({**_BASE_SPEC}, "/tmp/test.png")
+        assert result is True
+        mock_altair.Chart.from_dict.assert_called_once_with({**_BASE_SPEC})
+        mock_altair.Chart.from_dict.return_value.save.assert_called_once_with("/tmp/test.png")
+
+    def test_svg_format(self, altair_mocks):
+        result = render_with_altair({**_BASE_SPEC}, "/tmp/test.svg", format='svg')
+        assert result is True
+
+    @pytest.mark.parametrize("data,mark,encoding", [
+        pytest.param(
+            [{"x": 10, "y": 100, "category": "A"}],
+            "point",
+            {
+                **_BASE_SPEC["encoding"],
                 "color": {"field": "category", "type": "nominal"},
                 "tooltip": [
                     {"field": "x", "type": "quantitative"},
                     {"field": "y", "type": "quantitative"},
                 ],
             },
-        }
-
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
-
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is True
-
-    def test_render_with_title_property(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "title": "Test Chart",
-            "data": {"values": [{"x": 10, "y": 100}]},
-            "mark": "point",
-            "encoding": {
-                "x": {"field": "x", "type": "quantitative"},
-                "y": {"field": "y", "type": "quantitative"},
-            },
-        }
-
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
-
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is True
-
-    def test_render_exception_handling(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"x": 10, "y": 100}]},
-            "mark": "point",
-            "encoding": {
-                "x": {"field": "x", "type": "quantitative"},
-                "y": {"field": "y", "type": "quantitative"},
-            },
-        }
-
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
-        mock_altair.Chart.side_effect = Exception("Test error")
-
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is False
-
-    def test_mark_as_dict(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"x": 10, "y": 100}]},
-            "mark": {"type": "bar", "cornerRadiusEnd": 4},
-            "encoding": {
+            id="color_encoding",
+        ),
+        pytest.param(
+            _BASE_SPEC["data"]["values"],
+            {"type": "bar", "cornerRadiusEnd": 4},
+            {
                 "x": {"field": "x", "type": "ordinal"},
                 "y": {"field": "y", "type": "quantitative"},
             },
-        }
-
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
-
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is True
-
-    def test_arc_mark_for_pie(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"category": "A", "value": 10}]},
-            "mark": {"type": "arc", "innerRadius": 50},
-            "encoding": {
+            id="mark_as_dict",
+        ),
+        pytest.param(
+            [{"category": "A", "value": 10}],
+            {"type": "arc", "innerRadius": 50},
+            {
                 "theta": {"field": "value", "type": "quantitative"},
                 "color": {"field": "category", "type": "nominal"},
             },
-        }
-
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
-
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is True
-
-    def test_area_mark(self):
-        spec = {
-            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
-            "data": {"values": [{"date": "2024-01-01", "value": 100}]},
-            "mark": "area",
-            "encoding": {
+            id="arc",
+        ),
+        pytest.param(
+            [{"date": "2024-01-01", "value": 100}],
+            "area",
+            {
                 "x": {"field": "date", "type": "temporal"},
                 "y": {"field": "value", "type": "quantitative"},
             },
-        }
-
-        mock_altair = MagicMock()
-        mock_pd = MagicMock()
-
-        with patch.dict('sys.modules', {'altair': mock_altair, 'pandas': mock_pd}):
-            result = render_with_altair(spec, "/tmp/test.png")
-            assert result is True
+            id="area",
+        ),
+    ])
+    def test_render_mark_variants(self, altair_mocks, data, mark, encoding):
+        mock_altair, _ = altair_mocks
+        spec = {**_BASE_SPEC, "data": {"values": data}, "mark": mark, "encoding": encoding}
+        assert render_with_altair(spec, "/tmp/test.png") is True
+        mock_altair.Chart.from_dict.assert_called_once_with(spec)
+
+    def test_render_with_title_property(self, altair_mocks):
+        result = render_with_altair({**_BASE_SPEC, "title": "Test Chart"}, "/tmp/test.png")
+        assert result is True
+
+    def test_render_exception_handling(self, altair_mocks):
+        mock_altair, _ = altair_mocks
+        mock_altair.Chart.from_dict.side_effect = Exception("Test error")
+        result = render_with_altair({**_BASE_SPEC}, "/tmp/test.png")
+        assert result is False
+
+
+class TestRenderWithVlConvert:
+    """Test render_with_vl_convert function."""
+
+    def test_not_installed_returns_false(self, capsys):
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'vl_convert': None}):
+            assert render_with_vl_convert({"mark": "bar"}, "/tmp/test.png") is False
+        assert "vl-convert not installed" in capsys.readouterr().out
+
+    def test_png_written(self, tmp_path):
+        mock_vlc = MagicMock()
+        mock_vlc.vegalite_to_png.return_value = b"\x89PNG"
+        spec = {"mark": "bar"}
+        path = tmp_path / "chart.png"
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'vl_convert': mock_vlc}):
+            assert render_with_vl_convert(spec, str(path)) is True
+        mock_vlc.vegalite_to_png.assert_called_once_with(spec, scale=2.0)
+        assert path.read_bytes() == b"\x89PNG"
+
+    def test_svg_written(self, tmp_path):
+        mock_vlc = MagicMock()
+        mock_vlc.vegalite_to_svg.return_value = "<svg></svg>"
+        path = tmp_path / "chart.svg"
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'vl_convert': mock_vlc}):
+            assert render_with_vl_convert({"mark": "bar"}, str(path), "svg") is True
+        assert path.read_text() == "<svg></svg>"
+
+    def test_render_exception_returns_false(self, tmp_path, capsys):
+        mock_vlc = MagicMock()
+        mock_vlc.vegalite_to_png.side_effect = ValueError("bad spec")
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'vl_convert': mock_vlc}):
+            assert render_with_vl_convert({}, str(tmp_path / "chart.png")) is False
+        assert "Error rendering with vl-convert" in capsys.readouterr().out
+
+
+class TestRenderChart:
+    """Test render_chart backend selection."""
+
+    def test_auto_prefers_vl_convert(self):
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'vl_convert': MagicMock()}), \
+             patch('generate_chart.render_with_vl_convert', return_value=True) as vlc_render, \
+             patch('generate_chart.render_with_altair') as altair_render:
+            assert render_chart({}, "/tmp/test.png") is True
+        vlc_render.assert_called_once_with({}, "/tmp/test.png", "png")
+        altair_render.assert_not_called()
+
+    def test_auto_falls_back_to_altair(self):
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'vl_convert': None}), \
+             patch('generate_chart.render_with_altair', return_value=True) as altair_render:
+            assert render_chart({}, "/tmp/test.svg", "svg") is True
+        altair_render.assert_called_once_with({}, "/tmp/test.svg", "svg")
+
+    def test_explicit_altair_backend(self):
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'vl_convert': MagicMock()}), \
+             patch('generate_chart.render_with_vl_convert') as vlc_render, \
+             patch('generate_chart.render_with_altair', return_value=True):
+            assert render_chart({}, "/tmp/test.png", backend='altair') is True
+        vlc_render.assert_not_called()
 
 
 class TestGenerateChartMain:
     """Tests for the main() function in generate_chart.py"""
 
     @pytest.fixture
-    def temp_data_file(self):
+    def temp_data_file(self, tmp_path):
         def _create(data):
-            import tempfile
-            import json
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                json.dump(data, f)
-                return f.name
+            path = tmp_path / "data.json"
+            path.write_text(json.dumps(data))
+            return str(path)
         return _create
 
-    def test_main_with_json_format(self, temp_data_file, capsys):
-        import sys
-        import os
-        from generate_chart import main as chart_main
-        original_argv = sys.argv
+    def test_main_with_json_format(self, temp_data_file, tmp_path):
         data_file = temp_data_file([{"category": "A", "value": 10}])
-        try:
-            sys.argv = ['generate_chart.py', '--data-file', data_file, '--output', '/tmp/test_output.json', '--format', 'json']
-            result = chart_main()
-            assert result == 0
-            assert os.path.exists('/tmp/test_output.json')
-        finally:
-            sys.argv = original_argv
-            if os.path.exists('/tmp/test_output.json'):
-                os.unlink('/tmp/test_output.json')
-
-    def test_main_with_custom_title(self, temp_data_file, capsys):
-        import sys
-        import os
-        from generate_chart import main as chart_main
-        original_argv = sys.argv
+        output = str(tmp_path / "test_output.json")
+        result = chart_main(['--data-file', data_file, '--output', output, '--format', 'json'])
+        assert result == 0
+        assert os.path.exists(output)
+
+    def test_main_with_custom_title(self, temp_data_file, tmp_path):
         data_file = temp_data_file([{"category": "A", "value": 10}])
-        try:
-            sys.argv = ['generate_chart.py', '--data-file', data_file, '--output', '/tmp/test_title.json', '--title', 'Custom Title', '--format', 'json']
-            result = chart_main()
-            assert result == 0
-        finally:
-            sys.argv = original_argv
-            if os.path.exists('/tmp/test_title.json'):
-                os.unlink('/tmp/test_title.json')
-
-    def test_main_with_empty_data(self, temp_data_file, capsys):
-        import sys
-        from generate_chart import main as chart_main
-        original_argv = sys.argv
+        output = str(tmp_path / "test_title.json")
+        result = chart_main(['--data-file', data_file, '--output', output, '--title', 'Custom Title', '--format', 'json'])
+        assert result == 0
+
+    def test_main_with_empty_data(self, temp_data_file, tmp_path):
         data_file = temp_data_file([])
-        try:
-            sys.argv = ['generate_chart.py', '--data-file', data_file, '--output', '/tmp/test_empty.json', '--format', 'json']
-            result = chart_main()
-            assert result == 0
-        finally:
-            sys.argv = original_argv
+        result = chart_main(['--data-file', data_file, '--output', str(tmp_path / "test_empty.json"), '--format', 'json'])
+        assert result == 0
+
+    def test_main_with_external_data(self, temp_data_file, tmp_path):
+        data_file = temp_data_file([{"category": "A", "value": 10}])
+        output = tmp_path / "external.json"
+        assert chart_main(['--data-file', data_file, '--output', str(output),
+                           '--format', 'json', '--data', 'external']) == 0
+        assert json.loads(output.read_text())["data"]["url"] == "external.data.json"
+        assert (tmp_path / "external.data.json").exists()
+
+    def test_main_auto_keeps_medium_file_data_inline(self, temp_data_file, tmp_path):
+        data_file = temp_data_file([{"category": str(i), "value": i} for i in range(2000)])
+        output = tmp_path / "medium.json"
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'pyarrow': MagicMock()}):
+            assert chart_main(['--data-file', data_file, '--output', str(output), '--format', 'json']) == 0
+        assert "values" in json.loads(output.read_text())["data"]
+
+    def test_main_auto_streams_large_data_as_arrow(self, temp_data_file, capsys):
+        rows = [{"category": str(i), "value": i} for i in range(EXTERNAL_DATA_THRESHOLD + 1)]
+        data_file = temp_data_file(rows)
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'pyarrow': MagicMock()}), \
+             patch('generate_chart._encode_arrow_b64', return_value='QUJD'):
+            assert chart_main(['--data-file', data_file, '--output', '-', '--format', 'json']) == 0
+        captured = capsys.readouterr()
+        assert json.loads(captured.out)["data"]["format"] == {"type": "arrow"}
+        assert "vega-loader-arrow" in captured.err
+
+
+def test_encode_arrow_b64_with_real_pyarrow():
+    pyarrow = pytest.importorskip('pyarrow')
+    ipc = pytest.importorskip('pyarrow.ipc')
+    rows = [{"category": "A", "value": 10}, {"category": "B", "value": 20}]
+    encoded = generate_chart._encode_arrow_b64(rows)
+    table = ipc.open_stream(pyarrow.py_buffer(base64.b64decode(encoded))).read_all()
+    assert table.to_pylist() == rows
 
 
 class TestSaveVegaSpec:
     """Test save_vega_spec function."""
 
-    def test_saves_json_file(self):
+    def test_saves_json_file(self, tmp_path):
+        spec = {"test": "data"}
+        path = tmp_path / "test_spec.json"
+        save_vega_spec(spec, str(path))
+        assert json.loads(path.read_text()) == spec
+
+    def test_saves_json_file_without_orjson(self, tmp_path):
+        spec = {"test": "data"}
+        path = tmp_path / "test_spec_stdlib.json"
+        with patch('generate_chart.orjson', None):
+            save_vega_spec(spec, str(path))
+        assert json.loads(path.read_text()) == spec
+
+    def test_compact_by_default(self, tmp_path):
+        path = tmp_path / "chart.json"
+        save_vega_spec({"mark": "bar", "width": 800}, str(path))
+        assert "\n" not in path.read_text()
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_pretty_indents(self, tmp_path, use_orjson):
+        path = tmp_path / "chart.json"
+        spec = {"mark": "bar", "width": 800}
+        with patch('generate_chart.orjson', generate_chart.orjson if use_orjson else None):
+            save_vega_spec(spec, str(path), pretty=True)
+        assert path.read_text() == json.dumps(spec, indent=2)
+
+    def test_external_data_writes_sibling_file(self, tmp_path):
+        data = [{"category": "A", "value": 10}]
+        spec = {"mark": "bar", "data": {"values": data}}
+        path = str(tmp_path / "chart.json")
+        save_vega_spec(spec, path, data_mode='external')
+
+        loaded = json.loads((tmp_path / "chart.json").read_text())
+        assert loaded["data"] == {"url": "chart.data.json", "format": {"type": "json"}}
+        assert json.loads((tmp_path / "chart.data.json").read_text()) == data
+        # The caller's spec keeps its inline values
+        assert spec["data"] == {"values": data}
+
+    def test_external_data_without_values_is_unchanged(self, tmp_path):
+        spec = {"test": "data"}
+        path = str(tmp_path / "chart.json")
+        save_vega_spec(spec, path, data_mode='external')
+
+        assert json.loads((tmp_path / "chart.json").read_text()) == spec
+        assert not (tmp_path / "chart.data.json").exists()
+
+    def test_arrow_data_uses_data_url(self, tmp_path):
+        spec = {"mark": "bar", "data": {"values": [{"category": "A", "value": 10}]}}
+        path = str(tmp_path / "chart.json")
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'pyarrow': MagicMock()}), \
+             patch('generate_chart._encode_arrow_b64', return_value='QUJD'):
+            save_vega_spec(spec, path, data_mode='arrow')
+
+        loaded = json.loads((tmp_path / "chart.json").read_text())
+        assert loaded["data"] == {
+            "url": "data:application/vnd.apache.arrow.stream;base64,QUJD",
+            "format": {"type": "arrow"}
+        }
+
+    def test_arrow_data_without_pyarrow_stays_inline(self, tmp_path, capsys):
+        spec = {"mark": "bar", "data": {"values": [{"category": "A", "value": 10}]}}
+        path = str(tmp_path / "chart.json")
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'pyarrow': None}):
+            save_vega_spec(spec, path, data_mode='arrow')
+
+        assert json.loads((tmp_path / "chart.json").read_text()) == spec
+        assert "pyarrow not installed" in capsys.readouterr().out
+
+    def test_gzip_compression(self, tmp_path):
         spec = {"test": "data"}
-        path = os.path.join(tempfile.gettempdir(), "test_spec.json")
-        save_vega_spec(spec, path)
-        assert os.path.exists(path)
+        written = save_vega_spec(spec, str(tmp_path / "chart.json"), compress='gzip')
+        assert written == str(tmp_path / "chart.json.gz")
+        with gzip.open(written, 'rb') as f:
+            assert json.loads(f.read()) == spec
+
+    def test_lz_compression_writes_html(self, tmp_path):
+        mock_lzstring = MagicMock()
+        mock_lzstring.LZString.return_value.compressToBase64.return_value = 'N4Ig'
+        spec = {"title": "Sales <2024>", "mark": "bar"}
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'lzstring': mock_lzstring}):
+            written = save_vega_spec(spec, str(tmp_path / "chart.json"), compress='lz')
+
+        assert written == str(tmp_path / "chart.html")
+        page = (tmp_path / "chart.html").read_text()
+        assert 'LZString.decompressFromBase64("N4Ig")' in page
+        assert "Sales &lt;2024&gt;" in page
+        payload = mock_lzstring.LZString.return_value.compressToBase64.call_args[0][0]
+        assert json.loads(payload) == spec
+
+    @pytest.mark.parametrize("data,has_loader", [
+        ({"values": [{"a": 1}]}, False),
+        ({"url": "data:application/vnd.apache.arrow.stream;base64,QUJD", "format": {"type": "arrow"}}, True),
+    ], ids=["inline", "arrow"])
+    def test_lz_page_registers_arrow_loader_for_arrow_data(self, tmp_path, data, has_loader):
+        mock_lzstring = MagicMock()
+        mock_lzstring.LZString.return_value.compressToBase64.return_value = 'N4Ig'
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'lzstring': mock_lzstring}):
+            save_vega_spec({"mark": "bar", "data": data}, str(tmp_path / "chart.json"), compress='lz')
+        page = (tmp_path / "chart.html").read_text()
+        assert ("vega.formats('arrow', vegaLoaderArrow)" in page) is has_loader
+
+    def test_lz_compression_without_lzstring(self, tmp_path, capsys):
+        spec = {"test": "data"}
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'lzstring': None}):
+            written = save_vega_spec(spec, str(tmp_path / "chart.json"), compress='lz')
+        assert written == str(tmp_path / "chart.json")
+        assert json.loads((tmp_path / "chart.json").read_text()) == spec
+        assert "lzstring not installed" in capsys.readouterr().out
+
+
+class TestResolveDataMode:
+    """Test resolve_data_mode function."""
+
+    def test_explicit_mode_is_kept(self):
+        assert resolve_data_mode('inline', 10 ** 6) == 'inline'
+        assert resolve_data_mode('external', 1) == 'external'
+
+    def test_auto_small_is_inline(self):
+        assert resolve_data_mode('auto', 10) == 'inline'
+
+    def test_auto_large_is_external(self):
+        assert resolve_data_mode('auto', EXTERNAL_DATA_THRESHOLD + 1) == 'external'
+
+    @pytest.mark.parametrize("pyarrow", [MagicMock(), None], ids=["with_pyarrow", "without_pyarrow"])
+    def test_auto_file_never_uses_arrow(self, pyarrow):
+        with patch.dict('generate_chart._OPTIONAL_MODULES', {'pyarrow': pyarrow}):
+            assert resolve_data_mode('auto', EXTERNAL_DATA_THRESHOLD) == 'inline'
+            assert resolve_data_mode('auto', EXTERNAL_DATA_THRESHOLD + 1) == 'external'
+
+    def test_auto_large_stream_uses_arrow(self):
+        assert resolve_data_mode('auto', EXTERNAL_DATA_THRESHOLD, stream=True) == 'inline'
+        assert resolve_data_mode('auto', EXTERNAL_DATA_THRESHOLD + 1, stream=True) == 'arrow'
+
+    def test_explicit_arrow_is_kept(self):
+        assert resolve_data_mode('arrow', 1) == 'arrow'
 
-        with open(path, 'r') as f:
-            loaded = json.load(f)
-        assert loaded == spec
 
-        os.unlink(path)
+class TestOptionalImport:
+    """Test _optional_import helper."""
 
+    def test_returns_installed_module(self):
+        assert _optional_import('json') is json
 
-class TestDetectChartTypeEdgeCases:
-    """Test edge cases for chart type detection."""
+    def test_missing_module_returns_none(self):
+        assert _optional_import('deepdive_missing_module') is None
+        assert _OPTIONAL_MODULES['deepdive_missing_module'] is None
+
+    def test_result_is_cached(self):
+        with patch('generate_chart.importlib.import_module', return_value=json) as import_module:
+            _optional_import('json')
+            _optional_import('json')
+        import_module.assert_called_once_with('json')
+
+
+class TestLoadJson:
+    """Test load_json function."""
+
+    def test_loads_json_file(self):
+        data = [{"category": "A", "value": 10}]
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(data, f)
+            path = f.name
+        try:
+            assert load_json(path) == data
+        finally:
+            os.unlink(path)
+
+    def test_loads_json_file_without_orjson(self):
+        data = [{"category": "A", "value": 10}]
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(data, f)
+            path = f.name
+        try:
+            with patch('generate_chart.orjson', None):
+                assert load_json(path) == data
+        finally:
+            os.unlink(path)
+
+    def test_invalid_json_raises_decode_error(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            f.write('not valid json')
+            path = f.name
+        try:
+            with pytest.raises(json.JSONDecodeError):
+                load_json(path)
+        finally:
+            os.unlink(path)
 
-    def test_single_item_returns_pie(self):
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_dash_reads_stdin(self, monkeypatch, use_orjson):
         data = [{"category": "A", "value": 10}]
-        result = detect_chart_type(data)
-        assert result == "pie"
-
-    def test_all_string_columns_returns_pie(self):
-        data = [
-            {"name": "A", "label": "X"},
-            {"name": "B", "label": "Y"},
-        ]
-        result = detect_chart_type(data)
-        assert result == "pie"
-
-    def test_column_name_case_insensitive(self):
-        data = [
-            {"DATE": "2024-01-01", "value": 100},
-            {"DATE": "2024-02-01", "value": 150},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
-
-    def test_timestamp_column(self):
-        data = [
-            {"timestamp": "2024-01-01T10:00:00Z", "count": 100},
-            {"timestamp": "2024-01-02T10:00:00Z", "count": 150},
-        ]
-        result = detect_chart_type(data)
-        assert result == "line"
+        monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(json.dumps(data).encode())))
+        if not use_orjson:
+            monkeypatch.setattr('generate_chart.orjson', None)
+        assert load_json('-') == data
 
 
 class TestBuildVegaSpecEdgeCases:
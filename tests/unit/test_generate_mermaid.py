@@ -1,27 +1,236 @@
 """
 Unit tests for generate_mermaid.py - Mermaid diagram generation from database schemas.
+
+Nothing here writes outside tmp_path or patches process state without
+monkeypatch, so the module runs under pytest-xdist in any --dist mode:
+
+    pytest -n auto tests/unit/test_generate_mermaid.py
 """
 
 import pytest
+import functools
 import json
+import re
 import sys
 import os
-import tempfile
+from types import MappingProxyType
 from unittest.mock import patch, MagicMock
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
-
 from generate_mermaid import (
     generate_erd,
     generate_lineage,
     generate_query_plan,
     save_and_open,
+    encode_pako,
+    main as mermaid_main,
+    _build_fk_index,
+    BROWSER_THREAD_NAME,
 )
 
 
+def _join_browser_threads():
+    import threading
+    for thread in threading.enumerate():
+        if thread.name == BROWSER_THREAD_NAME:
+            thread.join()
+
+
+@functools.lru_cache(maxsize=None)
+def _token_pattern(tokens):
+    # Longest first, so a token that prefixes another doesn't shadow it
+    return re.compile("|".join(map(re.escape, sorted(tokens, key=len, reverse=True))))
+
+
+def _assert_all_in(result, tokens, *, forbidden=()):
+    """Assert every token occurs in result (in one regex pass) and no forbidden one does."""
+    tokens = tuple(tokens)
+    found = set(_token_pattern(tokens).findall(result))
+    # A token nested inside a longer match is missed by findall; fall back to `in`
+    missing = [token for token in tokens if token not in found and token not in result]
+    assert not missing, missing
+    for token in forbidden:
+        assert token not in result
+
+
+_USERS_TABLE = {
+    "columns": [{"name": "id", "type": "INT"}],
+    "primary_key": [{"column": "id"}],
+    "foreign_keys": [],
+}
+
+_ORDERS_TABLE = {
+    "columns": [
+        {"name": "id", "type": "INT"},
+        {"name": "user_id", "type": "INT"},
+    ],
+    "primary_key": [{"column": "id"}],
+    "foreign_keys": [
+        {"column": "user_id", "references_table": "users", "references_column": "id"}
+    ],
+}
+
+
+# Read-only schemas shared across the session, keyed by a stable id
+_SCHEMAS = MappingProxyType({
+    "users_orders": MappingProxyType({"tables": {"users": _USERS_TABLE, "orders": _ORDERS_TABLE}}),
+    "erd_multi_table": MappingProxyType({"tables": {
+        "users": _USERS_TABLE,
+        "orders": _ORDERS_TABLE,
+        "products": {
+            "columns": [{"name": "id", "type": "INT"}],
+            "primary_key": [{"column": "id"}],
+            "foreign_keys": [],
+        },
+    }}),
+    "lineage": MappingProxyType({"tables": {
+        "users": _USERS_TABLE,
+        "orders": _ORDERS_TABLE,
+        "posts": _ORDERS_TABLE,
+    }}),
+    "unsorted": MappingProxyType({"tables": {
+        "zebra": {"columns": [{"name": "id", "type": "INT"}], "primary_key": [], "foreign_keys": []},
+        "alpha": {"columns": [{"name": "id", "type": "INT"}], "primary_key": [], "foreign_keys": []},
+    }}),
+})
+
+
+@pytest.fixture(scope="session")
+def users_orders_schema():
+    """users plus orders with a user_id foreign key (read-only, shared across the session)."""
+    return _SCHEMAS["users_orders"]
+
+
+@pytest.fixture(scope="session")
+def lineage_schema():
+    """users referenced by both orders and posts."""
+    return _SCHEMAS["lineage"]
+
+
+@pytest.fixture(scope="session")
+def single_table_schema_file(shared_json_file):
+    """A lone users table written once per session for the main() tests to read."""
+    return shared_json_file({"tables": {"users": {
+        "columns": [{"name": "id", "type": "INT"}],
+        "primary_key": [],
+        "foreign_keys": [],
+    }}})
+
+
+class TestBuildFkIndex:
+    """Test _build_fk_index helper."""
+
+    def test_empty_schema(self):
+        assert _build_fk_index({}) == ({}, {}, {}, {})
+
+    def test_indexes_edges_both_ways(self):
+        schema = {
+            "tables": {
+                "users": {"foreign_keys": []},
+                "orders": {"foreign_keys": [{"column": "user_id", "references_table": "users"}]},
+                "payments": {"foreign_keys": [
+                    {"column": "order_id", "references_table": "orders"},
+                    {"column": "user_id", "references_table": "users"},
+                ]},
+            }
+        }
+        tables_dict, upper_names, edges, reverse_edges = _build_fk_index(schema)
+        assert tables_dict is schema["tables"]
+        assert upper_names == {"users": "USERS", "orders": "ORDERS", "payments": "PAYMENTS"}
+        assert edges == {"users": [], "orders": ["users"], "payments": ["orders", "users"]}
+        assert reverse_edges == {"users": ["orders", "payments"], "orders": ["payments"]}
+
+    def test_external_reference_gets_display_name(self):
+        schema = {"tables": {"orders": {"foreign_keys": [{"references_table": "ext_users"}]}}}
+        _, upper_names, edges, _ = _build_fk_index(schema)
+        assert upper_names["ext_users"] == "EXT_USERS"
+        assert edges["orders"] == ["ext_users"]
+
+    def test_missing_reference_is_skipped(self):
+        schema = {"tables": {"orders": {"foreign_keys": [{"column": "user_id"}]}}}
+        _, _, edges, reverse_edges = _build_fk_index(schema)
+        assert edges == {"orders": []}
+        assert reverse_edges == {}
+
+
+_USERS_ID_NAME = {
+    "columns": [
+        {"name": "id", "type": "INT"},
+        {"name": "name", "type": "VARCHAR(50)"},
+    ],
+    "primary_key": [{"column": "id"}],
+    "foreign_keys": [],
+}
+
+# (schema, substrings that must appear, substrings that must not) per generate_erd call
+ERD_CASES = [
+    pytest.param(
+        {"tables": {"users": {"columns": [], "primary_key": [], "foreign_keys": []}}},
+        ("erDiagram", "USERS {"), (),
+        id="single_table_no_columns",
+    ),
+    pytest.param(
+        {"tables": {"users": {**_USERS_ID_NAME, "primary_key": []}}},
+        ("USERS {", "INT id", "VARCHAR(50) name"), ("INT id PK",),
+        id="single_table_with_columns",
+    ),
+    pytest.param(
+        {"tables": {"users": _USERS_ID_NAME}},
+        ("INT id PK", "VARCHAR(50) name"), ("VARCHAR(50) name PK",),
+        id="primary_key_marked",
+    ),
+    pytest.param(
+        {"tables": {"order_items": {
+            "columns": [
+                {"name": "order_id", "type": "INT"},
+                {"name": "item_id", "type": "INT"},
+                {"name": "quantity", "type": "INT"},
+            ],
+            "primary_key": [{"column": "order_id"}, {"column": "item_id"}],
+            "foreign_keys": [],
+        }}},
+        ("INT order_id PK", "INT item_id PK"), ("INT quantity PK",),
+        id="multiple_primary_keys",
+    ),
+    pytest.param(
+        {"tables": {"orders": _ORDERS_TABLE}},
+        ("ORDERS {",), ("USERS ||--o{ ORDERS", "ORDERS ||--o{ USERS"),
+        id="relationship_not_added_for_missing_table",
+    ),
+    pytest.param(
+        {"tables": {"orders": {**_ORDERS_TABLE, "foreign_keys": [{"column": "user_id"}]}}},
+        ("ORDERS {",), ("||--o{",),
+        id="foreign_key_without_references_table_ignored",
+    ),
+    pytest.param(
+        {"tables": {"users": {"columns": [{"type": "INT"}], "primary_key": [], "foreign_keys": []}}},
+        ("INT unknown",), (),
+        id="unknown_column_name",
+    ),
+    pytest.param(
+        {"tables": {"orders": {"columns": [{"name": "id", "type": "INT"}], "primary_key": []}}},
+        ("ORDERS {", "INT id"), (),
+        id="missing_foreign_keys_key",
+    ),
+    pytest.param(
+        {"tables": {"users": {"primary_key": [], "foreign_keys": []}}},
+        ("USERS {",), (),
+        id="missing_columns_key",
+    ),
+    pytest.param(
+        {"tables": {"users": {"columns": [{"name": "id", "type": "INT"}], "foreign_keys": []}}},
+        ("USERS {", "INT id"), ("INT id PK",),
+        id="missing_primary_key_key",
+    ),
+]
+
+
 class TestGenerateErd:
     """Test generate_erd function."""
 
+    @pytest.mark.parametrize("schema,expected,forbidden", ERD_CASES)
+    def test_erd_contains(self, schema, expected, forbidden):
+        _assert_all_in(generate_erd(schema), expected, forbidden=forbidden)
+
     def test_empty_schema_returns_er_header_only(self):
         result = generate_erd({})
         assert result == "erDiagram"
@@ -30,202 +239,20 @@ class TestGenerateErd:
         result = generate_erd({"tables": {}})
         assert result == "erDiagram"
 
-    def test_single_table_no_columns(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "erDiagram" in result
-        assert "USERS {" in result
-
-    def test_single_table_with_columns(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "name", "type": "VARCHAR(50)"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "USERS {" in result
-        assert "INT id" in result
-        assert "VARCHAR(50) name" in result
-
-    def test_primary_key_marked(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "name", "type": "VARCHAR(50)"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "INT id PK" in result
-
-    def test_non_primary_key_no_pk_marker(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "name", "type": "VARCHAR(50)"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "VARCHAR(50) name" in result
-        assert "VARCHAR(50) name PK" not in result
-
-    def test_multiple_primary_keys(self):
-        schema = {
-            "tables": {
-                "order_items": {
-                    "columns": [
-                        {"name": "order_id", "type": "INT"},
-                        {"name": "item_id", "type": "INT"},
-                        {"name": "quantity", "type": "INT"},
-                    ],
-                    "primary_key": [{"column": "order_id"}, {"column": "item_id"}],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "INT order_id PK" in result
-        assert "INT item_id PK" in result
-
-    def test_relationship_added(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        result = generate_erd(schema)
+    def test_relationship_added(self, users_orders_schema):
+        result = generate_erd(users_orders_schema)
         assert "ORDERS ||--o{ USERS" in result
 
-    def test_relationship_not_added_for_missing_table(self):
-        schema = {
-            "tables": {
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "USERS ||--o{ ORDERS" not in result
-
     def test_filtered_tables_only_includes_specified(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                },
-                "products": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema, tables=["users", "orders"])
-        assert "USERS {" in result
-        assert "ORDERS {" in result
-        assert "PRODUCTS {" not in result
+        result = generate_erd(_SCHEMAS["erd_multi_table"], ["users", "orders"])
+        _assert_all_in(result, ("USERS {", "ORDERS {"), forbidden=("PRODUCTS {",))
 
-    def test_filtered_includes_related_tables(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        result = generate_erd(schema, tables=["orders"])
-        assert "ORDERS {" in result
-        assert "USERS {" in result
+    def test_filtered_includes_related_tables(self, users_orders_schema):
+        result = generate_erd(users_orders_schema, ["orders"])
+        _assert_all_in(result, ("ORDERS {", "USERS {"))
 
     def test_tables_sorted_alphabetically(self):
-        schema = {
-            "tables": {
-                "zebra": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "alpha": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-            }
-        }
-        result = generate_erd(schema)
+        result = generate_erd(_SCHEMAS["unsorted"])
         alpha_pos = result.find("ALPHA {")
         zebra_pos = result.find("ZEBRA {")
         assert alpha_pos < zebra_pos
@@ -241,46 +268,26 @@ class TestGenerateErd:
             }
         }
         result = generate_erd(schema, tables=["users", "missing_table"])
-        assert "USERS {" in result
-        assert "MISSING_TABLE" not in result
+        _assert_all_in(result, ("USERS {",), forbidden=("MISSING_TABLE",))
 
-    def test_foreign_key_without_references_table_ignored(self):
-        schema = {
-            "tables": {
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [{"column": "id"}],
-                    "foreign_keys": [
-                        {"column": "user_id"}
-                    ],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "||--o{" not in result
 
-    def test_unknown_column_handled_gracefully(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [
-                        {"type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "unknown" in result.lower()
+# (schema fixture, table_name, edges that must appear) per generate_lineage call
+LINEAGE_CASES = [
+    pytest.param("users_orders_schema", None, ("USERS -->|FK| ORDERS",), id="single_relationship"),
+    pytest.param("lineage_schema", None, ("USERS -->|FK| ORDERS", "USERS -->|FK| POSTS"),
+                 id="multiple_relationships"),
+    pytest.param("users_orders_schema", "orders", ("USERS -->|FK| ORDERS",), id="upstream_of_table"),
+    pytest.param("users_orders_schema", "users", ("USERS -->|FK| ORDERS",), id="downstream_of_table"),
+]
 
 
 class TestGenerateLineage:
     """Test generate_lineage function."""
 
+    @pytest.mark.parametrize("schema_fixture,table_name,expected", LINEAGE_CASES)
+    def test_lineage_contains(self, request, schema_fixture, table_name, expected):
+        _assert_all_in(generate_lineage(request.getfixturevalue(schema_fixture), table_name), expected)
+
     def test_empty_schema_returns_graph_header(self):
         result = generate_lineage({})
         assert result == "graph LR"
@@ -302,183 +309,79 @@ class TestGenerateLineage:
         result = generate_lineage(schema)
         assert result == "graph LR"
 
-    def test_single_relationship(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        result = generate_lineage(schema)
-        assert "USERS -->|FK| ORDERS" in result
-
-    def test_multiple_relationships(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                },
-                "posts": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                }
-            }
-        }
-        result = generate_lineage(schema)
-        assert "USERS -->|FK| ORDERS" in result
-        assert "USERS -->|FK| POSTS" in result
+    def test_missing_table_returns_graph_header(self):
+        result = generate_lineage({"tables": {}}, table_name="missing")
+        assert result == "graph LR"
 
-    def test_specific_table_shows_upstream_only(self):
+    def test_reuses_supplied_fk_index(self):
         schema = {
             "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                },
+                "users": {"foreign_keys": []},
+                "orders": {"foreign_keys": [{"references_table": "users"}]},
             }
         }
-        result = generate_lineage(schema, table_name="orders")
+        fk_index = _build_fk_index(schema)
+        with patch('generate_mermaid._build_fk_index') as build:
+            result = generate_lineage(schema, "users", fk_index=fk_index)
+        build.assert_not_called()
         assert "USERS -->|FK| ORDERS" in result
 
-    def test_specific_table_shows_downstream(self):
+    def test_downstream_lists_each_foreign_key(self):
         schema = {
             "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                },
-                "orders": {
-                    "columns": [
-                        {"name": "id", "type": "INT"},
-                        {"name": "user_id", "type": "INT"},
-                    ],
-                    "primary_key": [],
-                    "foreign_keys": [
-                        {"column": "user_id", "references_table": "users", "references_column": "id"}
-                    ],
-                },
+                "users": {"foreign_keys": []},
+                "transfers": {"foreign_keys": [
+                    {"column": "from_user", "references_table": "users"},
+                    {"column": "to_user", "references_table": "users"},
+                ]},
             }
         }
-        result = generate_lineage(schema, table_name="users")
-        assert "USERS -->|FK| ORDERS" in result
+        result = generate_lineage(schema, "users")
+        assert result.count("USERS -->|FK| TRANSFERS") == 2
 
-    def test_missing_table_returns_graph_header(self):
-        result = generate_lineage({"tables": {}}, table_name="missing")
-        assert result == "graph LR"
-
-
-class TestGenerateQueryPlan:
-    """Test generate_query_plan function."""
 
-    def test_empty_plan_returns_graph_header(self):
-        result = generate_query_plan(None)
-        assert result == "graph TD"
+class TestTypedSchema:
+    """generate_erd/generate_lineage on sample_schema_typed match the dict sample_schema."""
 
-    def test_empty_children_returns_graph_header(self):
-        result = generate_query_plan({})
-        assert result == "graph TD"
+    @pytest.mark.parametrize("tables", [None, ["users", "orders"]], ids=["all_tables", "selected_tables"])
+    def test_erd_matches_dict_schema(self, sample_schema, sample_schema_typed, tables):
+        result = generate_erd(sample_schema_typed, tables)
+        assert "USERS {" in result
+        assert result == generate_erd(sample_schema, tables)
 
-    def test_simple_node(self):
-        plan = {
-            "type": "Seq Scan",
-            "details": "on users",
-            "children": [],
-        }
-        result = generate_query_plan(plan)
-        assert "graph TD" in result
-        assert "Seq Scan" in result
+    @pytest.mark.parametrize("table_name", [None, "orders", "users"])
+    def test_lineage_matches_dict_schema(self, sample_schema, sample_schema_typed, table_name):
+        result = generate_lineage(sample_schema_typed, table_name)
+        assert "USERS -->|FK| ORDERS" in result
+        assert result == generate_lineage(sample_schema, table_name)
 
-    def test_node_with_details(self):
-        plan = {
-            "type": "Index Scan",
-            "details": "using idx_users_email on users",
-            "children": [],
-        }
-        result = generate_query_plan(plan)
-        assert "Index Scan" in result
-        assert "idx_users_email" in result
 
-    def test_nested_children(self):
-        plan = {
+# (plan, substrings that must appear) per generate_query_plan call
+QUERY_PLAN_CASES = [
+    pytest.param({"type": "Seq Scan", "details": "on users", "children": []},
+                 ("graph TD", "Seq Scan"), id="simple_node"),
+    pytest.param({"type": "Index Scan", "details": "using idx_users_email on users", "children": []},
+                 ("Index Scan", "idx_users_email"), id="node_with_details"),
+    pytest.param(
+        {
             "type": "Hash Join",
             "details": "",
             "children": [
-                {
-                    "type": "Seq Scan",
-                    "details": "on users",
-                    "children": [],
-                },
+                {"type": "Seq Scan", "details": "on users", "children": []},
                 {
                     "type": "Hash",
                     "details": "",
-                    "children": [
-                        {
-                            "type": "Seq Scan",
-                            "details": "on orders",
-                            "children": [],
-                        }
-                    ],
+                    "children": [{"type": "Seq Scan", "details": "on orders", "children": []}],
                 },
             ],
-        }
-        result = generate_query_plan(plan)
-        assert "Hash Join" in result
-        assert "Seq Scan" in result
-
-    def test_html_line_breaks_for_details(self):
-        plan = {
-            "type": "Nested Loop",
-            "details": "inner join",
-            "children": [],
-        }
-        result = generate_query_plan(plan)
-        assert "<br/>inner join" in result
-
-    def test_multiple_children_at_same_level(self):
-        plan = {
+        },
+        ("Hash Join", "Seq Scan<br/>on users", "Hash<br/>", "Seq Scan<br/>on orders"),
+        id="nested_children",
+    ),
+    pytest.param({"type": "Nested Loop", "details": "inner join", "children": []},
+                 ("<br/>inner join",), id="html_line_breaks_for_details"),
+    pytest.param(
+        {
             "type": "Append",
             "details": "",
             "children": [
@@ -486,125 +389,145 @@ class TestGenerateQueryPlan:
                 {"type": "Scan2", "details": "", "children": []},
                 {"type": "Scan3", "details": "", "children": []},
             ],
-        }
-        result = generate_query_plan(plan)
-        assert "Scan1" in result
-        assert "Scan2" in result
-        assert "Scan3" in result
+        },
+        ("Scan1", "Scan2", "Scan3"),
+        id="multiple_children_at_same_level",
+    ),
+    pytest.param({"type": "Root", "details": "", "children": [{"type": "Child1", "details": "", "children": []}]},
+                 ("node_0 --> node_1",), id="all_nodes_connected"),
+    pytest.param({"details": "some details", "children": []}, ("Unknown",), id="missing_type_key"),
+    pytest.param({"type": "Scan", "details": "test"}, ("Scan",), id="missing_children_key"),
+]
+
 
-    def test_all_nodes_connected(self):
+class TestGenerateQueryPlan:
+    """Test generate_query_plan function."""
+
+    @pytest.mark.parametrize("plan,expected", QUERY_PLAN_CASES)
+    def test_query_plan_contains(self, plan, expected):
+        _assert_all_in(generate_query_plan(plan), expected)
+
+    def test_empty_plan_returns_graph_header(self):
+        result = generate_query_plan(None)
+        assert result == "graph TD"
+
+    def test_empty_children_returns_graph_header(self):
+        result = generate_query_plan({})
+        assert result == "graph TD"
+
+    def test_node_ids_follow_preorder(self):
         plan = {
             "type": "Root",
-            "details": "",
             "children": [
-                {
-                    "type": "Child1",
-                    "details": "",
-                    "children": [],
-                },
+                {"type": "A", "children": [{"type": "A1"}]},
+                {"type": "B"},
             ],
         }
         result = generate_query_plan(plan)
-        assert "-->" in result
+        assert result.split("\n") == [
+            "graph TD",
+            "    node_0[Root<br/>]",
+            "    node_1[A<br/>]",
+            "    node_0 --> node_1",
+            "    node_2[A1<br/>]",
+            "    node_1 --> node_2",
+            "    node_3[B<br/>]",
+            "    node_0 --> node_3",
+        ]
+
+    def test_deep_plan_does_not_recurse(self):
+        plan = {"type": "Leaf"}
+        for depth in range(sys.getrecursionlimit() + 100):
+            plan = {"type": f"Level{depth}", "children": [plan]}
+        result = generate_query_plan(plan)
+        assert "Leaf" in result
+
+    def test_labels_are_escaped(self):
+        plan = {"type": "Index Scan", "details": 'idx["email"] | cost\nrows=1'}
+        result = generate_query_plan(plan)
+        assert "node_0[Index Scan<br/>idx&#91;&quot;email&quot;&#93; &#124; cost<br/>rows=1]" in result
+
+    def test_non_string_details(self):
+        result = generate_query_plan({"type": "Seq Scan", "details": 42.5})
+        assert "node_0[Seq Scan<br/>42.5]" in result
 
 
 class TestSaveAndOpen:
     """Test save_and_open function."""
 
-    def test_saves_mmd_file(self):
-        content = "graph LR\n    A --> B"
-        with tempfile.NamedTemporaryFile(suffix='.mmd', delete=False) as f:
-            path = f.name
-        try:
-            result = save_and_open(content, path, open_browser=False)
-            assert result == path
-            assert os.path.exists(path)
-
-            with open(path, 'r') as f:
-                assert f.read() == content
-        finally:
-            if os.path.exists(path):
-                os.unlink(path)
-
-    def test_creates_directory_if_not_exists(self):
+    @pytest.fixture
+    def stub_browser(self, monkeypatch):
+        browser = MagicMock()
+        monkeypatch.setattr("generate_mermaid.webbrowser", browser)
+        return browser
+
+    def test_saves_mmd_file(self, tmp_path):
         content = "graph LR\n    A --> B"
-        test_dir = os.path.join(tempfile.gettempdir(), "test_subdir_xyz")
-        path = os.path.join(test_dir, "test.mmd")
-        try:
-            result = save_and_open(content, path, open_browser=False)
-            assert os.path.exists(path)
-        finally:
-            if os.path.exists(path):
-                os.unlink(path)
-            if os.path.exists(test_dir):
-                os.rmdir(test_dir)
-
-    def test_no_open_browser_when_disabled(self):
+        path = str(tmp_path / "out.mmd")
+        result = save_and_open(content, path, open_browser=False)
+        assert result == path
+        with open(path, 'r') as f:
+            assert f.read() == content
+
+    def test_creates_directory_if_not_exists(self, tmp_path):
         content = "graph LR\n    A --> B"
-        with tempfile.NamedTemporaryFile(suffix='.mmd', delete=False) as f:
-            path = f.name
-        try:
-            with patch('generate_mermaid.webbrowser') as mock_browser:
-                save_and_open(content, path, open_browser=False)
-                mock_browser.open.assert_not_called()
-        finally:
-            if os.path.exists(path):
-                os.unlink(path)
-
-    def test_opens_browser_when_enabled(self):
+        path = str(tmp_path / "sub" / "test.mmd")
+        save_and_open(content, path, open_browser=False)
+        assert os.path.exists(path)
+
+    def test_no_open_browser_when_disabled(self, tmp_path, stub_browser):
         content = "graph LR\n    A --> B"
-        with tempfile.NamedTemporaryFile(suffix='.mmd', delete=False) as f:
-            path = f.name
-        try:
-            with patch('generate_mermaid.webbrowser') as mock_browser:
-                save_and_open(content, path, open_browser=True)
-                mock_browser.open.assert_called_once()
-                call_args = mock_browser.open.call_args[0][0]
-                assert "mermaid.live" in call_args
-                assert "pako:" in call_args
-        finally:
-            if os.path.exists(path):
-                os.unlink(path)
+        save_and_open(content, str(tmp_path / "out.mmd"), open_browser=False)
+        stub_browser.open.assert_not_called()
 
+    def test_opens_browser_when_enabled(self, tmp_path, stub_browser):
+        content = "graph LR\n    A --> B"
+        save_and_open(content, str(tmp_path / "out.mmd"), open_browser=True)
+        _join_browser_threads()
+        stub_browser.open.assert_called_once()
+        _assert_all_in(stub_browser.open.call_args[0][0], ("mermaid.live", "pako:"))
 
-class TestGenerateMermaidEdgeCases:
-    """Test edge cases for mermaid generation."""
+    def test_browser_url_uses_pako_encoding(self, tmp_path, stub_browser):
+        content = "graph LR\n    A --> B"
+        save_and_open(content, str(tmp_path / "test.mmd"), open_browser=True)
+        _join_browser_threads()
+        url = stub_browser.open.call_args[0][0]
+        assert url == f"https://mermaid.live/edit#pako:{encode_pako(content)}"
+
+    def test_reports_browser_opened(self, tmp_path, stub_browser, capsys):
+        save_and_open("graph LR", str(tmp_path / "out.mmd"), open_browser=True)
+        _join_browser_threads()
+        assert "✓ Opened in browser" in capsys.readouterr().out
+
+    def test_reports_browser_error_from_thread(self, tmp_path, stub_browser, capsys):
+        stub_browser.open.side_effect = RuntimeError("no runnable browser")
+        save_and_open("graph LR", str(tmp_path / "out.mmd"), open_browser=True)
+        _join_browser_threads()
+        out = capsys.readouterr().out
+        assert "⚠ Could not open browser: no runnable browser" in out
+        assert "Opened in browser" not in out
+
+
+class TestEncodePako:
+    """Test encode_pako function."""
+
+    def test_round_trips_through_zlib(self):
+        import base64
+        import zlib
+        content = "graph LR\n    A --> B"
+        encoded = encode_pako(content)
+        padded = encoded + "=" * (-len(encoded) % 4)
+        state = json.loads(zlib.decompress(base64.urlsafe_b64decode(padded)))
+        assert state["code"] == content
+        assert json.loads(state["mermaid"]) == {"theme": "default"}
 
-    def test_erd_handles_missing_foreign_keys_key(self):
-        schema = {
-            "tables": {
-                "orders": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "ORDERS {" in result
+    def test_is_url_safe(self):
+        encoded = encode_pako("graph LR\n" + "\n".join(f"    N{i} --> N{i + 1}" for i in range(200)))
+        assert not set(encoded) - set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
 
-    def test_erd_handles_missing_columns_key(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "USERS {" in result
 
-    def test_erd_handles_missing_primary_key_key(self):
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        result = generate_erd(schema)
-        assert "USERS {" in result
+class TestGenerateMermaidEdgeCases:
+    """Test edge cases for mermaid generation."""
 
     def test_lineage_handles_missing_foreign_keys_key(self):
         schema = {
@@ -617,67 +540,36 @@ class TestGenerateMermaidEdgeCases:
         result = generate_lineage(schema)
         assert result == "graph LR"
 
-    def test_query_plan_handles_missing_type_key(self):
-        plan = {
-            "details": "some details",
-            "children": [],
-        }
-        result = generate_query_plan(plan)
-        assert "Unknown" in result
-
-    def test_query_plan_handles_missing_children_key(self):
-        plan = {
-            "type": "Scan",
-            "details": "test",
-        }
-        result = generate_query_plan(plan)
-        assert "Scan" in result
-
 
 class TestGenerateMermaidMain:
     """Tests for the main() function in generate_mermaid.py"""
 
     @pytest.fixture
-    def temp_schema_file(self):
+    def temp_schema_file(self, tmp_path):
         def _create(schema):
-            import tempfile
-            import json
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                json.dump(schema, f)
-                return f.name
+            path = tmp_path / "schema.json"
+            path.write_text(json.dumps(schema))
+            return str(path)
         return _create
 
-    def test_main_with_erd_type(self, temp_schema_file, capsys):
-        import sys
-        import os
-        from generate_mermaid import main as mermaid_main
-        original_argv = sys.argv
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        try:
-            sys.argv = ['generate_mermaid.py', 'erd', '--schema-file', schema_file, '--output', '/tmp/test_erd.mmd', '--no-open']
-            result = mermaid_main()
-            assert result == 0
-            assert os.path.exists('/tmp/test_erd.mmd')
-        finally:
-            sys.argv = original_argv
-            os.unlink(schema_file)
-            if os.path.exists('/tmp/test_erd.mmd'):
-                os.unlink('/tmp/test_erd.mmd')
-
-    def test_main_with_lineage_type(self, temp_schema_file, capsys):
-        import sys
-        import os
-        from generate_mermaid import main as mermaid_main
-        original_argv = sys.argv
+    def test_main_with_erd_type(self, single_table_schema_file, tmp_path, monkeypatch, capsys):
+        output = str(tmp_path / "test_erd.mmd")
+        monkeypatch.setattr(sys, 'argv', ['generate_mermaid.py', 'erd', '--schema-file', single_table_schema_file, '--output', output, '--no-open'])
+        result = mermaid_main()
+        assert result == 0
+        assert os.path.exists(output)
+
+    @pytest.mark.parametrize("schema_fixture", ["sample_schema", "sample_schema_typed"])
+    def test_main_reads_in_memory_schema(self, request, memory_json_file, sample_schema, schema_fixture,
+                                         tmp_path, monkeypatch):
+        schema_file = memory_json_file(request.getfixturevalue(schema_fixture))
+        output = tmp_path / "erd.mmd"
+        monkeypatch.setattr(sys, 'argv', ['generate_mermaid.py', 'erd', '--schema-file', schema_file,
+                                          '--output', str(output), '--no-open'])
+        assert mermaid_main() == 0
+        assert output.read_text() == generate_erd(sample_schema)
+
+    def test_main_with_lineage_type(self, temp_schema_file, tmp_path, monkeypatch, capsys):
         schema = {
             "tables": {
                 "users": {
@@ -698,37 +590,13 @@ class TestGenerateMermaidMain:
             }
         }
         schema_file = temp_schema_file(schema)
-        try:
-            sys.argv = ['generate_mermaid.py', 'lineage', '--schema-file', schema_file, '--output', '/tmp/test_lineage.mmd', '--no-open']
-            result = mermaid_main()
-            assert result == 0
-        finally:
-            sys.argv = original_argv
-            os.unlink(schema_file)
-            if os.path.exists('/tmp/test_lineage.mmd'):
-                os.unlink('/tmp/test_lineage.mmd')
-
-    def test_main_with_schema_type_alias(self, temp_schema_file, capsys):
-        import sys
-        import os
-        from generate_mermaid import main as mermaid_main
-        original_argv = sys.argv
-        schema = {
-            "tables": {
-                "users": {
-                    "columns": [{"name": "id", "type": "INT"}],
-                    "primary_key": [],
-                    "foreign_keys": [],
-                }
-            }
-        }
-        schema_file = temp_schema_file(schema)
-        try:
-            sys.argv = ['generate_mermaid.py', 'schema', '--schema-file', schema_file, '--output', '/tmp/test_schema.mmd', '--no-open']
-            result = mermaid_main()
-            assert result == 0
-        finally:
-            sys.argv = original_argv
-            os.unlink(schema_file)
-            if os.path.exists('/tmp/test_schema.mmd'):
-                os.unlink('/tmp/test_schema.mmd')
\ No newline at end of file
+        output = str(tmp_path / "test_lineage.mmd")
+        monkeypatch.setattr(sys, 'argv', ['generate_mermaid.py', 'lineage', '--schema-file', schema_file, '--output', output, '--no-open'])
+        result = mermaid_main()
+        assert result == 0
+
+    def test_main_with_schema_type_alias(self, single_table_schema_file, tmp_path, monkeypatch, capsys):
+        output = str(tmp_path / "test_schema.mmd")
+        monkeypatch.setattr(sys, 'argv', ['generate_mermaid.py', 'schema', '--schema-file', single_table_schema_file, '--output', output, '--no-open'])
+        result = mermaid_main()
+        assert result == 0
@@ -3,11 +3,26 @@ Unit tests for validate_query.py - SQL query validation and safety checks.
 """
 
 import pytest
+import re
 import sys
-import os
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+from unittest.mock import patch, MagicMock
 
-from validate_query import QueryValidator, check_batch_size
+import validate_query
+from validate_query import (QueryValidator, WarnCode, check_batch_size, read_batch_file, lru_cache_clear,
+                            detect_dangerous, validate_many, _cached_validate, CACHE_MAX_QUERY_LENGTH,
+                            main as validate_main)
+
+
+@pytest.fixture
+def validator():
+    """A fresh non-strict QueryValidator."""
+    return QueryValidator()
+
+
+@pytest.fixture
+def strict_validator():
+    """A fresh strict-mode QueryValidator."""
+    return QueryValidator(strict=True)
 
 
 class TestQueryValidatorInit:
@@ -33,169 +48,203 @@ class TestQueryValidatorInit:
 class TestDetectWriteOperation:
     """Test _detect_write_operation method."""
 
-    def test_select_is_not_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("SELECT * FROM users") is False
-
-    def test_insert_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("INSERT INTO users VALUES (1)") is True
-
-    def test_insert_capitalized_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("INSERT INTO users VALUES (1)") is True
-
-    def test_update_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("UPDATE users SET name = 'test'") is True
-
-    def test_delete_from_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("DELETE FROM users WHERE id = 1") is True
-
-    def test_delete_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("DELETE FROM users") is True
-
-    def test_truncate_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("TRUNCATE TABLE users") is True
-
-    def test_drop_table_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("DROP TABLE users") is True
-
-    def test_drop_database_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("DROP DATABASE mydb") is True
-
-    def test_alter_table_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("ALTER TABLE users ADD COLUMN age INT") is True
-
-    def test_create_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("CREATE TABLE test (id INT)") is True
-
-    def test_grant_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("GRANT SELECT ON users TO analyst") is True
-
-    def test_revoke_is_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("REVOKE INSERT ON users FROM intern") is True
-
-    def test_cte_with_insert_not_detected_greedy_regex(self):
-        validator = QueryValidator()
-        query = "WITH new_users AS (INSERT INTO users VALUES (1)) SELECT * FROM users"
-        assert validator._detect_write_operation(query) is False
-
-    def test_cte_with_update_not_detected_greedy_regex(self):
-        validator = QueryValidator()
-        query = "WITH updated AS (UPDATE users SET active = true) SELECT * FROM users"
-        assert validator._detect_write_operation(query) is False
-
-    def test_cte_with_delete_not_detected_greedy_regex(self):
-        validator = QueryValidator()
-        query = "WITH deleted AS (DELETE FROM users WHERE active = false) SELECT * FROM users"
-        assert validator._detect_write_operation(query) is False
-
-    def test_cte_select_not_write(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("WITH data AS (SELECT 1) SELECT * FROM data") is False
-
-    def test_case_insensitive(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("select * from users") is False
-        assert validator._detect_write_operation("INSERT into users values (1)") is True
-
-    def test_whitespace_variations(self):
-        validator = QueryValidator()
-        assert validator._detect_write_operation("  SELECT * FROM users") is False
-        assert validator._detect_write_operation("INSERT  INTO  users VALUES (1)") is True
+    @pytest.mark.parametrize("query,expected", [
+        pytest.param("SELECT * FROM users", False, id="select"),
+        pytest.param("INSERT INTO users VALUES (1)", True, id="insert"),
+        pytest.param("UPDATE users SET name = 'test'", True, id="update"),
+        pytest.param("DELETE FROM users WHERE id = 1", True, id="delete_from"),
+        pytest.param("DELETE FROM users", True, id="delete"),
+        pytest.param("TRUNCATE TABLE users", True, id="truncate"),
+        pytest.param("DROP TABLE users", True, id="drop_table"),
+        pytest.param("DROP DATABASE mydb", True, id="drop_database"),
+        pytest.param("ALTER TABLE users ADD COLUMN age INT", True, id="alter_table"),
+        pytest.param("CREATE TABLE test (id INT)", True, id="create"),
+        pytest.param("GRANT SELECT ON users TO analyst", True, id="grant"),
+        pytest.param("REVOKE INSERT ON users FROM intern", True, id="revoke"),
+        pytest.param("WITH new_users AS (INSERT INTO users VALUES (1)) SELECT * FROM users", False,
+                     id="cte_with_insert_not_detected_greedy_regex"),
+        pytest.param("WITH updated AS (UPDATE users SET active = true) SELECT * FROM users", False,
+                     id="cte_with_update_not_detected_greedy_regex"),
+        pytest.param("WITH deleted AS (DELETE FROM users WHERE active = false) SELECT * FROM users", False,
+                     id="cte_with_delete_not_detected_greedy_regex"),
+        pytest.param("WITH data AS (SELECT 1) SELECT * FROM data", False, id="cte_select"),
+        pytest.param("WITH data AS (SELECT 1) INSERT INTO users SELECT * FROM data", True, id="cte_insert"),
+        pytest.param("  WITH data AS (SELECT 1) DELETE FROM users", True, id="leading_whitespace_cte_delete"),
+        pytest.param("SELECT 1; WITH data AS (SELECT 1) DELETE FROM users", True, id="cte_write_after_statement"),
+        pytest.param("-- note\nWITH data AS (SELECT 1) DELETE FROM users", True, id="cte_write_after_comment"),
+        pytest.param("select * from users", False, id="lowercase_select"),
+        pytest.param("INSERT into users values (1)", True, id="mixed_case_insert"),
+        pytest.param("  SELECT * FROM users", False, id="leading_whitespace_select"),
+        pytest.param("INSERT  INTO  users VALUES (1)", True, id="extra_whitespace_insert"),
+        pytest.param("DROP ", False, id="trailing_whitespace_drop"),
+        pytest.param("  GRANT \n", False, id="trailing_whitespace_grant"),
+        pytest.param("DROP TABLE users ", True, id="trailing_whitespace_after_statement"),
+    ])
+    def test_detect_write(self, validator, query, expected):
+        assert validator._detect_write_operation(query) is expected
 
 
 class TestCheckDangerousPatterns:
     """Test _check_dangerous_patterns method."""
 
-    def test_drop_after_semicolon_warning(self):
-        validator = QueryValidator(strict=False)
-        validator._check_dangerous_patterns("SELECT 1; DROP TABLE users")
-        assert any("DROP after semicolon" in w for w in validator.warnings)
-
-    def test_delete_after_semicolon_warning(self):
-        validator = QueryValidator(strict=False)
-        validator._check_dangerous_patterns("SELECT 1; DELETE FROM users")
-        assert any("DELETE after semicolon" in w for w in validator.warnings)
-
-    def test_comment_injection_warning(self):
-        validator = QueryValidator(strict=False)
-        validator._check_dangerous_patterns("SELECT * FROM users --")
-        assert any("Comment injection" in w for w in validator.warnings)
-
-    def test_block_comment_warning(self):
-        validator = QueryValidator(strict=False)
-        validator._check_dangerous_patterns("SELECT * /* comment */ FROM users")
-        assert any("Block comment" in w for w in validator.warnings)
-
-    def test_union_select_warning(self):
-        validator = QueryValidator(strict=False)
-        validator._check_dangerous_patterns("SELECT * FROM users UNION SELECT * FROM admins")
-        assert any("UNION SELECT" in w for w in validator.warnings)
-
-    def test_sleep_function_warning(self):
-        validator = QueryValidator(strict=False)
-        validator._check_dangerous_patterns("SELECT SLEEP(5)")
-        assert any("SLEEP function" in w for w in validator.warnings)
-
-    def test_benchmark_function_warning(self):
-        validator = QueryValidator(strict=False)
-        validator._check_dangerous_patterns("SELECT BENCHMARK(1000000, MD5('test'))")
-        assert any("BENCHMARK function" in w for w in validator.warnings)
-
-    def test_strict_mode_converts_to_error(self):
-        validator = QueryValidator(strict=True)
-        validator._check_dangerous_patterns("SELECT SLEEP(5)")
-        assert any("SLEEP function" in e for e in validator.errors)
-        assert len(validator.warnings) == 0
+    @pytest.mark.parametrize("query,code", [
+        pytest.param("SELECT 1; DROP TABLE users", WarnCode.DROP_AFTER_SEMI, id="drop_after_semicolon"),
+        pytest.param("SELECT 1; DELETE FROM users", WarnCode.DELETE_AFTER_SEMI, id="delete_after_semicolon"),
+        pytest.param("SELECT * FROM users --", WarnCode.LINE_COMMENT, id="comment_injection"),
+        pytest.param("SELECT * /* comment */ FROM users", WarnCode.BLOCK_COMMENT, id="block_comment"),
+        pytest.param("SELECT * FROM users UNION SELECT * FROM admins", WarnCode.UNION_SELECT, id="union_select"),
+        pytest.param("SELECT SLEEP(5)", WarnCode.SLEEP, id="sleep_function"),
+        pytest.param("SELECT BENCHMARK(1000000, MD5('test'))", WarnCode.BENCHMARK, id="benchmark_function"),
+    ])
+    def test_dangerous_pattern_warning(self, validator, query, code):
+        validator._check_dangerous_patterns(query)
+        assert validator.warning_codes == {code}
+        assert len(validator.warnings) == 1
 
-    def test_no_dangerous_patterns(self):
-        validator = QueryValidator(strict=False)
+    def test_strict_mode_converts_to_error(self, strict_validator):
+        strict_validator._check_dangerous_patterns("SELECT SLEEP(5)")
+        assert WarnCode.SLEEP in strict_validator.warning_codes
+        assert strict_validator.errors == ["DANGER: SLEEP function (potential DoS)"]
+        assert len(strict_validator.warnings) == 0
+
+    def test_no_dangerous_patterns(self, validator):
         validator._check_dangerous_patterns("SELECT * FROM users WHERE id = 1")
         assert len(validator.warnings) == 0
         assert len(validator.errors) == 0
 
-    def test_multiple_dangerous_patterns(self):
-        validator = QueryValidator(strict=False)
+    def test_multiple_dangerous_patterns(self, validator):
         validator._check_dangerous_patterns("SELECT SLEEP(5); DROP TABLE users")
         assert len(validator.warnings) == 2
 
+    def test_hyperscan_ids_map_to_patterns(self, validator):
+        def scan(data, match_event_handler):
+            for id_ in (5, 0, 5):
+                match_event_handler(id_, 0, 1, 0, None)
+
+        lru_cache_clear()
+        db = MagicMock()
+        db.scan.side_effect = scan
+        with patch('validate_query._DANGEROUS_DB', db):
+            validator._check_dangerous_patterns("SELECT SLEEP(5); DROP TABLE users")
+        db.scan.assert_called_once()
+        assert validator.warnings == [
+            "WARNING: Potential SQL injection: DROP after semicolon",
+            "WARNING: SLEEP function (potential DoS)",
+        ]
+
+    def test_non_ascii_query_skips_hyperscan(self, validator):
+        lru_cache_clear()
+        db = MagicMock()
+        with patch('validate_query._DANGEROUS_DB', db):
+            validator._check_dangerous_patterns("SELECT SLEEP(5) -- café")
+        db.scan.assert_not_called()
+        assert WarnCode.SLEEP in validator.warning_codes
+
+    def test_re_fallback_without_hyperscan(self, validator):
+        lru_cache_clear()
+        with patch('validate_query._DANGEROUS_DB', None):
+            validator._check_dangerous_patterns("SELECT * FROM users UNION SELECT * FROM admins")
+        assert WarnCode.UNION_SELECT in validator.warning_codes
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1 --",
+    "SELECT 1 --  \n\t",
+    "SELECT 1 ---",
+    "SELECT 1 -- x",
+    "SELECT '--' FROM t",
+    "/*/",
+    "/**/",
+    "SELECT /* a */ 1",
+    "SELECT /* a\n */ 1",
+    "SELECT /* a\n/* b */",
+    "SELECT 1 /* a",
+])
+def test_literal_checks_match_regex(query):
+    for name, pattern, _, _ in QueryValidator.DANGEROUS_PATTERNS:
+        if name in validate_query.LITERAL_DANGEROUS_CHECKS:
+            expected = re.search(pattern, query, re.IGNORECASE) is not None
+            assert validate_query.LITERAL_DANGEROUS_CHECKS[name](query) is expected, name
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1; DROP TABLE users",
+    "SELECT * FROM users --\n",
+    "SELECT * FROM users -- x",
+    "SELECT /* UNION SELECT */ 1",
+    "SELECT * FROM a UNION\x1cSELECT 1",
+    "SELECT sleep (1), Benchmark(1, 2)",
+    "SELECT * FROM users WHERE id = 1",
+])
+def test_hyperscan_matches_re(query):
+    pytest.importorskip("hyperscan")
+    db = validate_query._compile_dangerous_db()
+    with patch('validate_query._DANGEROUS_DB', db):
+        hs_hits = validate_query._scan_dangerous(query)
+    with patch('validate_query._DANGEROUS_DB', None):
+        re_hits = validate_query._scan_dangerous(query)
+    assert hs_hits == re_hits
+
+
+class TestDetectDangerous:
+    """Test the detect_dangerous function."""
+
+    def test_returns_warnings(self):
+        assert detect_dangerous("SELECT SLEEP(5)", False) == (
+            ("WARNING: SLEEP function (potential DoS)",), (), frozenset({WarnCode.SLEEP}))
+
+    def test_strict_returns_errors(self):
+        assert detect_dangerous("SELECT SLEEP(5)", True) == (
+            (), ("DANGER: SLEEP function (potential DoS)",), frozenset({WarnCode.SLEEP}))
+
+    def test_clean_query(self):
+        assert detect_dangerous("SELECT id FROM users WHERE id = 1", False) == ((), (), frozenset())
+
+    def test_messages_are_shared_constants(self):
+        first, _, _ = detect_dangerous.__wrapped__("SELECT SLEEP(5)", False)
+        second, _, _ = detect_dangerous.__wrapped__("SELECT SLEEP(10)", False)
+        assert first[0] is second[0]
+
+    def test_repeated_query_uses_cache(self):
+        lru_cache_clear()
+        detect_dangerous("SELECT SLEEP(5)", False)
+        detect_dangerous("SELECT SLEEP(5)", False)
+        assert detect_dangerous.cache_info().hits == 1
+
+    def test_long_query_bypasses_cache(self, validator):
+        lru_cache_clear()
+        validator._check_dangerous_patterns("SELECT SLEEP(5) -- " + "a" * CACHE_MAX_QUERY_LENGTH)
+        assert detect_dangerous.cache_info().currsize == 0
+        assert WarnCode.SLEEP in validator.warning_codes
+
+    def test_query_at_cutoff_is_cached(self, validator):
+        lru_cache_clear()
+        query = "SELECT SLEEP(5) -- " + "a" * (CACHE_MAX_QUERY_LENGTH - 19)
+        assert len(query) == CACHE_MAX_QUERY_LENGTH
+        validator._check_dangerous_patterns(query)
+        assert detect_dangerous.cache_info().currsize == 1
+
 
 class TestCheckCommonMistakes:
     """Test _check_common_mistakes method."""
 
-    def test_select_star_without_where(self):
-        validator = QueryValidator()
+    def test_select_star_without_where(self, validator):
         validator._check_common_mistakes("SELECT * FROM users")
         assert "Missing WHERE clause on SELECT *" in validator.warnings
 
-    def test_equals_null_comparison(self):
-        validator = QueryValidator()
+    def test_equals_null_comparison(self, validator):
         validator._check_common_mistakes("SELECT * FROM users WHERE name = NULL")
         assert "Use IS NULL instead of = NULL" in validator.warnings
 
-    def test_no_mistake_with_where_clause(self):
-        validator = QueryValidator()
+    def test_no_mistake_with_where_clause(self, validator):
         validator._check_common_mistakes("SELECT * FROM users WHERE id = 1")
         assert len(validator.warnings) == 0
 
-    def test_no_mistake_with_is_null(self):
-        validator = QueryValidator()
+    def test_no_mistake_with_is_null(self, validator):
         validator._check_common_mistakes("SELECT * FROM users WHERE name IS NULL")
         assert len(validator.warnings) == 0
 
-    def test_case_insensitive_mistakes(self):
-        validator = QueryValidator()
+    def test_case_insensitive_mistakes(self, validator):
         validator._check_common_mistakes("select * from users")
         assert "Missing WHERE clause on SELECT *" in validator.warnings
 
@@ -203,28 +252,23 @@ class TestCheckCommonMistakes:
 class TestCheckStructure:
     """Test _check_structure method."""
 
-    def test_unmatched_parentheses_error(self):
-        validator = QueryValidator()
+    def test_unmatched_parentheses_error(self, validator):
         validator._check_structure("SELECT * FROM users WHERE (id = 1")
         assert any("Unmatched parentheses" in err for err in validator.errors)
 
-    def test_unmatched_single_quotes_error(self):
-        validator = QueryValidator()
+    def test_unmatched_single_quotes_error(self, validator):
         validator._check_structure("SELECT * FROM users WHERE name = 'test")
         assert "Syntax: Unmatched single quotes" in validator.errors
 
-    def test_valid_parentheses_no_error(self):
-        validator = QueryValidator()
+    def test_valid_parentheses_no_error(self, validator):
         validator._check_structure("SELECT COUNT(*) FROM (SELECT id FROM users) t")
         assert len(validator.errors) == 0
 
-    def test_valid_quotes_no_error(self):
-        validator = QueryValidator()
+    def test_valid_quotes_no_error(self, validator):
         validator._check_structure("SELECT * FROM users WHERE name = 'test'")
         assert len(validator.errors) == 0
 
-    def test_escaped_quotes_no_error(self):
-        validator = QueryValidator()
+    def test_escaped_quotes_no_error(self, validator):
         validator._check_structure("SELECT * FROM users WHERE name = 'O\\'Brien'")
         assert len(validator.errors) == 0
 
@@ -232,57 +276,27 @@ class TestCheckStructure:
 class TestClassifyQuery:
     """Test _classify_query method."""
 
-    def test_select_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("SELECT * FROM users") == "SELECT"
-
-    def test_insert_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("INSERT INTO users VALUES (1)") == "INSERT"
-
-    def test_update_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("UPDATE users SET name = 'test'") == "UPDATE"
-
-    def test_delete_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("DELETE FROM users") == "DELETE"
-
-    def test_create_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("CREATE TABLE test (id INT)") == "CREATE"
-
-    def test_drop_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("DROP TABLE users") == "DROP"
-
-    def test_alter_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("ALTER TABLE users ADD COLUMN age") == "ALTER"
-
-    def test_cte_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("WITH data AS (SELECT 1) SELECT * FROM data") == "CTE"
-
-    def test_other_classification(self):
-        validator = QueryValidator()
-        assert validator._classify_query("SHOW TABLES") == "OTHER"
-
-    def test_leading_whitespace(self):
-        validator = QueryValidator()
-        assert validator._classify_query("   SELECT * FROM users") == "SELECT"
-
-    def test_case_insensitive(self):
-        validator = QueryValidator()
-        assert validator._classify_query("select * from users") == "SELECT"
-        assert validator._classify_query("SELECT * FROM users") == "SELECT"
+    @pytest.mark.parametrize("query,expected", [
+        pytest.param("SELECT * FROM users", "SELECT", id="select"),
+        pytest.param("INSERT INTO users VALUES (1)", "INSERT", id="insert"),
+        pytest.param("UPDATE users SET name = 'test'", "UPDATE", id="update"),
+        pytest.param("DELETE FROM users", "DELETE", id="delete"),
+        pytest.param("CREATE TABLE test (id INT)", "CREATE", id="create"),
+        pytest.param("DROP TABLE users", "DROP", id="drop"),
+        pytest.param("ALTER TABLE users ADD COLUMN age", "ALTER", id="alter"),
+        pytest.param("WITH data AS (SELECT 1) SELECT * FROM data", "CTE", id="cte"),
+        pytest.param("SHOW TABLES", "OTHER", id="other"),
+        pytest.param("   SELECT * FROM users", "SELECT", id="leading_whitespace"),
+        pytest.param("select * from users", "SELECT", id="lowercase"),
+    ])
+    def test_classify(self, validator, query, expected):
+        assert validator._classify_query(query) == expected
 
 
 class TestGetSummary:
     """Test get_summary method."""
 
-    def test_valid_query_summary(self):
-        validator = QueryValidator()
+    def test_valid_query_summary(self, validator):
         result = validator.validate("SELECT * FROM users WHERE id = 1")
         summary = validator.get_summary(result)
         assert "Query Type: SELECT" in summary
@@ -290,68 +304,143 @@ class TestGetSummary:
         assert "Valid: ✓" in summary
         assert "ERRORS:" not in summary
 
-    def test_invalid_query_summary(self):
-        validator = QueryValidator()
+    def test_invalid_query_summary(self, validator):
         result = validator.validate("SELECT * FROM users WHERE (id = 1")
         summary = validator.get_summary(result)
         assert "Valid: ✗" in summary
         assert "ERRORS:" in summary
 
-    def test_write_operation_summary(self):
-        validator = QueryValidator()
+    def test_write_operation_summary(self, validator):
         result = validator.validate("INSERT INTO users VALUES (1)")
         summary = validator.get_summary(result)
         assert "Write Operation: Yes" in summary
 
-    def test_warnings_in_summary(self):
-        validator = QueryValidator()
+    def test_warnings_in_summary(self, validator):
         result = validator.validate("SELECT * FROM users")
         summary = validator.get_summary(result)
         assert "WARNINGS:" in summary
 
-    def test_empty_warnings_no_warnings_section(self):
-        validator = QueryValidator()
+    def test_empty_warnings_no_warnings_section(self, validator):
         result = validator.validate("SELECT id FROM users WHERE id = 1")
         summary = validator.get_summary(result)
         assert "WARNINGS:" not in summary
 
+    def test_full_summary_layout(self, validator):
+        result = {'query_type': 'DELETE', 'is_write': True, 'is_valid': False,
+                  'errors': ['e1', 'e2'], 'warnings': ['w1']}
+        assert validator.get_summary(result) == (
+            "Query Type: DELETE\nWrite Operation: Yes\nValid: ✗\n"
+            "\nERRORS:\n  ✗ e1\n  ✗ e2\n"
+            "\nWARNINGS:\n  ⚠ w1"
+        )
+
 
 class TestValidate:
     """Test the main validate method."""
 
-    def test_valid_select_query(self):
-        validator = QueryValidator()
+    def test_valid_select_query(self, validator):
         result = validator.validate("SELECT id, name FROM users WHERE active = true")
         assert result["is_valid"] is True
         assert result["is_write"] is False
         assert result["query_type"] == "SELECT"
         assert len(result["errors"]) == 0
 
-    def test_valid_insert_query(self):
-        validator = QueryValidator()
+    def test_valid_insert_query(self, validator):
         result = validator.validate("INSERT INTO users (name) VALUES ('test')")
         assert result["is_valid"] is True
         assert result["is_write"] is True
         assert result["query_type"] == "INSERT"
 
-    def test_dangerous_query_not_valid(self):
-        validator = QueryValidator(strict=True)
-        result = validator.validate("SELECT SLEEP(10)")
+    def test_dangerous_query_not_valid(self, strict_validator):
+        result = strict_validator.validate("SELECT SLEEP(10)")
         assert result["is_valid"] is False
         assert len(result["errors"]) > 0
 
-    def test_strict_mode_affects_dangerous(self):
-        validator_strict = QueryValidator(strict=True)
-        result_strict = validator_strict.validate("SELECT SLEEP(10)")
+    def test_strict_mode_affects_dangerous(self, strict_validator):
+        result_strict = strict_validator.validate("SELECT SLEEP(10)")
         assert result_strict["is_valid"] is False
 
-    def test_non_strict_mode_allows_dangerous(self):
-        validator_non_strict = QueryValidator(strict=False)
-        result_non_strict = validator_non_strict.validate("SELECT SLEEP(10)")
+    def test_non_strict_mode_allows_dangerous(self, validator):
+        result_non_strict = validator.validate("SELECT SLEEP(10)")
         assert result_non_strict["is_valid"] is True
         assert len(result_non_strict["warnings"]) > 0
 
 
+class TestValidateCache:
+    """Test memoization of validate results."""
+
+    def test_repeated_query_uses_cache(self):
+        lru_cache_clear()
+        validator = QueryValidator()
+        validator.validate("SELECT SLEEP(1)")
+        validator.validate("SELECT SLEEP(1)")
+        assert _cached_validate.cache_info().hits == 1
+
+    def test_cached_result_lists_are_independent(self, validator):
+        first = validator.validate("SELECT SLEEP(1)")
+        first["warnings"].append("extra")
+        second = validator.validate("SELECT SLEEP(1)")
+        assert "extra" not in second["warnings"]
+        assert validator.warnings is second["warnings"]
+
+    def test_cache_hit_restores_warning_codes(self, validator):
+        validator.validate("SELECT SLEEP(1)")
+        validator.warning_codes.add("extra")
+        validator.validate("SELECT SLEEP(1)")
+        assert validator.warning_codes == {WarnCode.SLEEP}
+
+    def test_strict_flag_is_part_of_key(self):
+        assert QueryValidator(strict=False).validate("SELECT SLEEP(1)")["is_valid"] is True
+        assert QueryValidator(strict=True).validate("SELECT SLEEP(1)")["is_valid"] is False
+
+    def test_long_query_bypasses_cache(self):
+        lru_cache_clear()
+        query = "SELECT id FROM users WHERE name = '" + "a" * CACHE_MAX_QUERY_LENGTH + "'"
+        QueryValidator().validate(query)
+        assert _cached_validate.cache_info().currsize == 0
+
+    def test_query_at_cutoff_is_cached(self):
+        lru_cache_clear()
+        query = "SELECT id FROM users WHERE name = '" + "a" * (CACHE_MAX_QUERY_LENGTH - 36) + "'"
+        assert len(query) == CACHE_MAX_QUERY_LENGTH
+        QueryValidator().validate(query)
+        assert _cached_validate.cache_info().currsize == 1
+
+    def test_lru_cache_clear_forces_recheck(self, validator):
+        validator.validate("SELECT SLEEP(1)")
+        lru_cache_clear()
+        with patch.object(QueryValidator, '_run_checks', autospec=True,
+                          side_effect=QueryValidator._run_checks) as run_checks:
+            validator.validate("SELECT SLEEP(1)")
+        run_checks.assert_called_once()
+
+
+class TestValidateMany:
+    """Test validate_many batch validation."""
+
+    @pytest.mark.parametrize("strict", [False, True])
+    def test_matches_validate(self, strict):
+        queries = [
+            "SELECT 1;",
+            "DROP TABLE users",
+            "SELECT * FROM users UNION SELECT * FROM admins",
+            "   ",
+            "SELECT SLEEP(5) -- x",
+            "INSERT INTO users VALUES (1",
+            "",
+            "SELECT /* note */ id FROM users WHERE id = 1 --",
+        ]
+        expected = [QueryValidator(strict=strict).validate(query) for query in queries]
+        assert validate_many(queries, strict) == expected
+
+    def test_hits_do_not_cross_query_boundaries(self):
+        results = validate_many(["SELECT 1;", "DROP TABLE users", "SELECT 1 UNION", "SELECT 2"])
+        assert all(not result["warnings"] for result in results)
+
+    def test_empty_batch(self):
+        assert validate_many([]) == []
+
+
 class TestCheckBatchSize:
     """Test check_batch_size function."""
 
@@ -389,39 +478,57 @@ class TestCheckBatchSize:
         result = check_batch_size("DELETE FROM users", 0)
         assert result["is_batch"] is False
 
+    def test_non_batch_result_shape(self):
+        assert check_batch_size("SELECT * FROM users", 5000) == {"is_batch": False, "affected_rows": 5000}
+
+    def test_small_operation_skips_write_detection(self):
+        with patch('validate_query.detect_write') as detect:
+            result = check_batch_size("DELETE FROM users", 10)
+        detect.assert_not_called()
+        assert result == {"is_batch": False, "affected_rows": 10}
+
 
 class TestQueryValidatorEdgeCases:
     """Test edge cases and boundary conditions."""
 
-    def test_empty_query(self):
-        validator = QueryValidator()
+    def test_empty_query(self, validator):
         result = validator.validate("")
         assert result["is_write"] is False
         assert result["query_type"] == "OTHER"
 
-    def test_whitespace_only_query(self):
-        validator = QueryValidator()
+    def test_whitespace_only_query(self, validator):
         result = validator.validate("   ")
         assert result["is_write"] is False
         assert result["query_type"] == "OTHER"
 
-    def test_multiple_semicolons(self):
-        validator = QueryValidator()
-        result = validator.validate("SELECT 1; SELECT 2; DROP TABLE users")
-        assert any("DROP after semicolon" in w for w in result["warnings"])
+    def test_empty_query_skips_checks(self, validator):
+        validator.validate("SELECT SLEEP(1)")
+        with patch.object(QueryValidator, '_run_checks') as run_checks:
+            result = validator.validate(" \n\t")
+        run_checks.assert_not_called()
+        assert result == {'is_write': False, 'is_valid': True, 'errors': [], 'warnings': [], 'query_type': 'OTHER'}
+        assert validator.warning_codes == set()
 
-    def test_nested_comments(self):
-        validator = QueryValidator()
-        result = validator.validate("SELECT /* outer /* inner */ */ * FROM users")
-        assert any("Block comment" in w for w in result["warnings"])
+    def test_multiple_semicolons(self, validator):
+        validator.validate("SELECT 1; SELECT 2; DROP TABLE users")
+        assert WarnCode.DROP_AFTER_SEMI in validator.warning_codes
 
-    def test_case_variations_in_dangerous(self):
-        validator = QueryValidator()
+    def test_nested_comments(self, validator):
+        validator.validate("SELECT /* outer /* inner */ */ * FROM users")
+        assert WarnCode.BLOCK_COMMENT in validator.warning_codes
+
+    def test_case_variations_in_dangerous(self, validator):
         validator._check_dangerous_patterns("select sleep(5)")
         assert len(validator.warnings) == 1
 
-    def test_whitespace_variations_in_mistakes(self):
-        validator = QueryValidator()
+    def test_unicode_case_variations_in_dangerous(self, validator):
+        # re.IGNORECASE matches these against the ASCII letters, so the
+        # keyword prefilter must not skip them
+        validator._check_dangerous_patterns("SELECT 1 UNıON SELECT 2")
+        validator._check_dangerous_patterns("SELECT ſLEEP(5)")
+        assert len(validator.warnings) == 2
+
+    def test_whitespace_variations_in_mistakes(self, validator):
         validator._check_common_mistakes("SELECT  *  FROM  users")
         assert "Missing WHERE clause on SELECT *" in validator.warnings
 
@@ -429,24 +536,21 @@ class TestQueryValidatorEdgeCases:
 class TestValidateQueryCLIAdditional:
     """Additional tests for CLI coverage."""
 
-    def test_get_summary_with_both_errors_and_warnings(self):
-        validator = QueryValidator(strict=True)
-        result = validator.validate("SELECT SLEEP(5)")
+    def test_get_summary_with_both_errors_and_warnings(self, strict_validator):
+        result = strict_validator.validate("SELECT SLEEP(5)")
         assert len(result["errors"]) > 0
         assert len(result["warnings"]) == 0
-        summary = validator.get_summary(result)
+        summary = strict_validator.get_summary(result)
         assert "ERRORS:" in summary
 
-    def test_get_summary_with_only_errors(self):
-        validator = QueryValidator(strict=True)
-        result = validator.validate("SELECT SLEEP(5)")
+    def test_get_summary_with_only_errors(self, strict_validator):
+        result = strict_validator.validate("SELECT SLEEP(5)")
         assert len(result["errors"]) > 0
-        summary = validator.get_summary(result)
+        summary = strict_validator.get_summary(result)
         assert "ERRORS:" in summary
         assert "WARNINGS:" not in summary
 
-    def test_get_summary_with_only_warnings(self):
-        validator = QueryValidator(strict=False)
+    def test_get_summary_with_only_warnings(self, validator):
         result = validator.validate("SELECT * FROM users")
         assert len(result["errors"]) == 0
         assert len(result["warnings"]) > 0
@@ -454,24 +558,20 @@ class TestValidateQueryCLIAdditional:
         assert "ERRORS:" not in summary
         assert "WARNINGS:" in summary
 
-    def test_validate_with_cte_query(self):
-        validator = QueryValidator()
+    def test_validate_with_cte_query(self, validator):
         result = validator.validate("WITH data AS (SELECT 1) SELECT * FROM data")
         assert result["query_type"] == "CTE"
         assert result["is_write"] is False
 
-    def test_validate_with_multiple_warnings(self):
-        validator = QueryValidator(strict=False)
+    def test_validate_with_multiple_warnings(self, validator):
         result = validator.validate("SELECT SLEEP(5); DROP TABLE users")
         assert len(result["warnings"]) >= 2
 
-    def test_validate_classifies_unknown_query(self):
-        validator = QueryValidator()
+    def test_validate_classifies_unknown_query(self, validator):
         result = validator.validate("EXPLAIN SELECT 1")
         assert result["query_type"] == "OTHER"
 
-    def test_validate_handles_unicode_in_query(self):
-        validator = QueryValidator()
+    def test_validate_handles_unicode_in_query(self, validator):
         result = validator.validate("SELECT * FROM users WHERE name = 'José'")
         assert result["is_valid"] is True
 
@@ -488,35 +588,32 @@ class TestValidateQueryCLIAdditional:
 class TestValidateQueryMain:
     """Tests for the main() function in validate_query.py"""
 
-    def test_main_with_valid_query(self, capsys):
-        import sys
-        from validate_query import main as validate_main
-        original_argv = sys.argv
-        sys.argv = ['validate_query.py', '--query', 'SELECT * FROM users WHERE id = 1']
-        try:
-            result = validate_main()
-            assert result == 0
-        finally:
-            sys.argv = original_argv
-
-    def test_main_with_strict_mode(self, capsys):
-        import sys
-        from validate_query import main as validate_main
-        original_argv = sys.argv
-        sys.argv = ['validate_query.py', '--query', 'SELECT SLEEP(5)', '--strict']
-        try:
-            result = validate_main()
-            assert result == 1
-        finally:
-            sys.argv = original_argv
-
-    def test_main_with_batch_check(self, capsys):
-        import sys
-        from validate_query import main as validate_main
-        original_argv = sys.argv
-        sys.argv = ['validate_query.py', '--query', 'DELETE FROM users', '--check-batch', '--estimated-rows', '2000']
-        try:
-            result = validate_main()
-            assert result == 0
-        finally:
-            sys.argv = original_argv
\ No newline at end of file
+    def test_main_with_valid_query(self, monkeypatch):
+        monkeypatch.setattr(sys, 'argv', ['validate_query.py', '--query', 'SELECT * FROM users WHERE id = 1'])
+        assert validate_main() == 0
+
+    def test_main_with_strict_mode(self, monkeypatch):
+        monkeypatch.setattr(sys, 'argv', ['validate_query.py', '--query', 'SELECT SLEEP(5)', '--strict'])
+        assert validate_main() == 1
+
+    def test_main_with_batch_check(self, monkeypatch):
+        monkeypatch.setattr(sys, 'argv', ['validate_query.py', '--query', 'DELETE FROM users',
+                                          '--check-batch', '--estimated-rows', '2000'])
+        assert validate_main() == 0
+
+    def test_main_with_batch_file(self, monkeypatch, capsys, tmp_path):
+        batch_file = tmp_path / "queries.sql"
+        batch_file.write_text("SELECT 1\n\nSELECT SLEEP(5)\n")
+        monkeypatch.setattr(sys, 'argv', ['validate_query.py', '--batch-file', str(batch_file), '--strict'])
+        assert validate_main() == 1
+        out = capsys.readouterr().out
+        assert '=== QUERY 1 ===' in out
+        assert '=== QUERY 2 ===' in out
+        assert '=== QUERY 3 ===' not in out
+
+
+class TestReadBatchFile:
+    def test_skips_blank_lines(self, tmp_path):
+        batch_file = tmp_path / "queries.sql"
+        batch_file.write_text("SELECT 1\n\n   \n  SELECT 2  \n")
+        assert read_batch_file(str(batch_file)) == ["SELECT 1", "SELECT 2"]